@@ -13,9 +13,11 @@ from pathlib import Path
 # Resolve imports from repository root.
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 PYTHONPATH_ENTRIES = (str(PROJECT_ROOT), str(PROJECT_ROOT / "tganalytics"))
+_sys_path = set(sys.path)
 for entry in PYTHONPATH_ENTRIES:
-    if entry not in sys.path:
+    if entry not in _sys_path:
         sys.path.insert(0, entry)
+        _sys_path.add(entry)
 
 # Allow auth-only bootstrap requests for this helper.
 os.environ.setdefault("TG_AUTH_BOOTSTRAP", "1")
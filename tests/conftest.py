@@ -2,6 +2,7 @@
 Pytest configuration for tg-mcp tests
 """
 
+import os
 import sys
 from pathlib import Path
 import pytest
@@ -125,6 +126,19 @@ def mock_bot_and_user_iterator():
     
     return AsyncIteratorMock([bot_user, regular_user])
 
+@pytest.fixture
+def actions():
+    """Модуль Action MCP (импортируется один раз, далее берется из sys.modules)
+
+    Менять его глобальные флаги только через monkeypatch.setattr, чтобы
+    состояние откатывалось после каждого теста.
+    """
+    os.environ.setdefault("TG_API_ID", "1")
+    os.environ.setdefault("TG_API_HASH", "testhash")
+    import mcp_server_actions
+
+    return mcp_server_actions
+
 @pytest.fixture(scope="session")
 def event_loop():
     """Создает event loop для асинхронных тестов"""
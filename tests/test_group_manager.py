@@ -10,6 +10,15 @@ from telethon.errors.rpcerrorlist import UserAlreadyParticipantError, UserNotPar
 from tganalytics.domain.groups import GroupManager
 from telethon.tl.types import User
 
+
+def _msg(msg_id, text=None):
+    """Сырое сообщение Telethon с минимальным набором полей для _message_to_dict."""
+    return SimpleNamespace(
+        id=msg_id, date=None, from_id=None,
+        message=f"m{msg_id}" if text is None else text, media=None,
+        fwd_from=None, forward=None, reply_to=None,
+    )
+
 @pytest.mark.asyncio
 async def test_get_group_info_success(mock_telegram_client, mock_channel):
     """Тест успешного получения информации о группе"""
@@ -292,3 +301,89 @@ async def test_send_file_invalid_target(mock_telegram_client):
     group_manager = GroupManager(mock_telegram_client)
     result = await group_manager.send_file("x", "/tmp/example.md")
     assert result is False
+
+
+@pytest.mark.asyncio
+async def test_iter_messages_streams_and_skips_service(mock_telegram_client, mock_channel):
+    """iter_messages отдаёт словари по одному и пропускает служебные сообщения."""
+    async def mock_iter_messages(*args, **kwargs):
+        for msg in (_msg(3, "hi"), _msg(2, ""), _msg(1, "привет")):
+            yield msg
+
+    mock_telegram_client.get_entity.return_value = mock_channel
+    mock_telegram_client.iter_messages = mock_iter_messages
+
+    group_manager = GroupManager(mock_telegram_client)
+    items = [item async for item in group_manager.iter_messages(-1001234567890)]
+
+    assert [item["id"] for item in items] == [3, 1]
+    assert items[1]["text"] == "привет"
+    assert await group_manager.get_messages(-1001234567890) == items
+
+
+@pytest.mark.asyncio
+async def test_iter_messages_fetches_pages_through_safe_api_call(mock_telegram_client, mock_channel, monkeypatch):
+    """Каждая страница истории — отдельный вызов через _safe_api_call."""
+    import tganalytics.domain.groups as groups_module
+
+    async def mock_iter_messages(entity, limit=None, offset_id=0, min_id=0):
+        start = offset_id - 1 if offset_id else 5
+        for msg_id in list(range(start, min_id, -1))[:limit]:
+            yield _msg(msg_id)
+
+    calls = []
+    real_safe_api_call = groups_module._safe_api_call
+
+    async def tracking_safe_api_call(func, *args, **kwargs):
+        calls.append(args[2:])
+        return await real_safe_api_call(func, *args, **kwargs)
+
+    monkeypatch.setattr(groups_module, "_MESSAGES_PAGE_SIZE", 2)
+    monkeypatch.setattr(groups_module, "_safe_api_call", tracking_safe_api_call)
+    mock_telegram_client.get_entity.return_value = mock_channel
+    mock_telegram_client.iter_messages = mock_iter_messages
+
+    group_manager = GroupManager(mock_telegram_client)
+    items = [item async for item in group_manager.iter_messages(-1001234567890)]
+
+    assert [item["id"] for item in items] == [5, 4, 3, 2, 1]
+    # entity lookup + страницы (offset_id, min_id): 0 -> 4 -> 2
+    assert calls[1:] == [(0, 0), (4, 0), (2, 0)]
+
+
+@pytest.mark.asyncio
+async def test_get_messages_parallel_merges_disjoint_windows(mock_telegram_client, mock_channel):
+    """get_messages_parallel покрывает весь диапазон ID без дублей, от новых к старым."""
+    windows = []
+
+    async def mock_iter_messages(entity, limit=None, min_id=0, max_id=0, reverse=False):
+        windows.append((min_id, max_id))
+        for msg_id in range(max_id - 1, min_id, -1):
+            yield _msg(msg_id)
+
+    mock_telegram_client.get_entity.return_value = mock_channel
+    mock_telegram_client.get_messages = AsyncMock(return_value=[_msg(10)])
+    mock_telegram_client.iter_messages = mock_iter_messages
+
+    group_manager = GroupManager(mock_telegram_client)
+    items = await group_manager.get_messages_parallel(-1001234567890, min_id=2, workers=3)
+
+    assert [item["id"] for item in items] == list(range(10, 2, -1))
+    assert len(windows) == 3
+
+
+@pytest.mark.asyncio
+async def test_get_messages_parallel_propagates_window_errors(mock_telegram_client, mock_channel):
+    """Ошибка одного окна не превращается в пустую (обрезанную) выгрузку."""
+    async def mock_iter_messages(entity, limit=None, min_id=0, max_id=0, reverse=False):
+        if min_id > 0:
+            raise ConnectionError("network down")
+        yield _msg(1)
+
+    mock_telegram_client.get_entity.return_value = mock_channel
+    mock_telegram_client.get_messages = AsyncMock(return_value=[SimpleNamespace(id=10)])
+    mock_telegram_client.iter_messages = mock_iter_messages
+
+    group_manager = GroupManager(mock_telegram_client)
+    with pytest.raises(ConnectionError):
+        await group_manager.get_messages_parallel(-1001234567890, workers=2)
@@ -167,6 +167,18 @@ class TestRateLimiter:
         assert new_limiter.daily_counters["join_count"] == 1
         assert new_limiter.daily_counters["api_calls"] == 1
     
+    @pytest.mark.asyncio
+    async def test_counters_file_cached_until_rewritten(self):
+        """Файл счетчиков перечитывается только после изменения"""
+        await self.limiter.increment_api_counter()
+
+        with patch("builtins.open", side_effect=AssertionError("unexpected read")):
+            assert self.limiter.get_stats()["api_calls"] == 1
+
+        # Запись другим процессом (новый экземпляр с тем же data_dir) видна сразу
+        await RateLimiter(data_dir=self.temp_dir).increment_api_counter()
+        assert self.limiter.get_stats()["api_calls"] == 2
+    
     def test_get_stats(self):
         """Тест получения статистики"""
         stats = self.limiter.get_stats()
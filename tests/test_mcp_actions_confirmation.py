@@ -1,7 +1,5 @@
 import pytest
 
-import mcp_server_actions as actions
-
 
 class _FakeManager:
     async def send_message(self, group, message_text):
@@ -10,13 +8,14 @@ class _FakeManager:
 
 class _FakeCtx:
     current_session = "test"
+    manager = None
 
     async def get_manager(self):
         return _FakeManager()
 
 
 @pytest.mark.asyncio
-async def test_send_message_requires_exact_confirmation_text(monkeypatch, tmp_path):
+async def test_send_message_requires_exact_confirmation_text(actions, monkeypatch, tmp_path):
     monkeypatch.setattr(actions, "SAFE_STARTUP_BLOCK_REASON", None)
     monkeypatch.setattr(actions, "ACTIONS_ENABLED", True)
     monkeypatch.setattr(actions, "REQUIRE_ALLOWLIST", True)
@@ -40,7 +39,7 @@ async def test_send_message_requires_exact_confirmation_text(monkeypatch, tmp_pa
 
 
 @pytest.mark.asyncio
-async def test_send_message_requires_one_time_approval_code(monkeypatch, tmp_path):
+async def test_send_message_requires_one_time_approval_code(actions, monkeypatch, tmp_path):
     monkeypatch.setattr(actions, "SAFE_STARTUP_BLOCK_REASON", None)
     monkeypatch.setattr(actions, "ACTIONS_ENABLED", True)
     monkeypatch.setattr(actions, "REQUIRE_ALLOWLIST", True)
@@ -97,7 +96,7 @@ async def test_send_message_requires_one_time_approval_code(monkeypatch, tmp_pat
 
 
 @pytest.mark.asyncio
-async def test_send_message_blocks_immediate_execute_after_dry_run(monkeypatch, tmp_path):
+async def test_send_message_blocks_immediate_execute_after_dry_run(actions, monkeypatch, tmp_path):
     monkeypatch.setattr(actions, "SAFE_STARTUP_BLOCK_REASON", None)
     monkeypatch.setattr(actions, "ACTIONS_ENABLED", True)
     monkeypatch.setattr(actions, "REQUIRE_ALLOWLIST", True)
@@ -1,4 +1,9 @@
-from mcp_actions_policy import detect_unsafe_defaults
+import hashlib
+import json
+
+import pytest
+
+from mcp_actions_policy import detect_unsafe_defaults, hash_payload
 
 
 def _safe_env() -> dict[str, str]:
@@ -10,28 +15,41 @@ def _safe_env() -> dict[str, str]:
     }
 
 
-def test_detect_unsafe_defaults_flags_empty_allowlist_when_required():
-    env = _safe_env()
-    env["TG_ACTIONS_ALLOWED_GROUPS"] = ""
-
-    issues = detect_unsafe_defaults(
-        env=env,
-        require_allowlist=True,
-        require_confirmation_text=True,
-        require_approval_code=True,
-        idempotency_enabled=True,
-    )
-
-    assert any("TG_ACTIONS_ALLOWED_GROUPS" in issue for issue in issues)
-
-
-def test_detect_unsafe_defaults_allows_non_empty_allowlist():
+@pytest.mark.parametrize(
+    ("override", "expected_issue"),
+    [
+        ({"TG_ACTIONS_ALLOWED_GROUPS": ""}, "TG_ACTIONS_ALLOWED_GROUPS"),
+        ({}, None),
+    ],
+    ids=["flags_empty_allowlist_when_required", "allows_non_empty_allowlist"],
+)
+def test_detect_unsafe_defaults(override, expected_issue):
     issues = detect_unsafe_defaults(
-        env=_safe_env(),
+        env=_safe_env() | override,
         require_allowlist=True,
         require_confirmation_text=True,
         require_approval_code=True,
         idempotency_enabled=True,
     )
 
-    assert issues == []
+    if expected_issue is None:
+        assert issues == []
+    else:
+        assert any(expected_issue in issue for issue in issues)
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"action": "add_member", "target": "-1001234567890", "user": "alice"},
+        {"user": "тест \"q\" \\ ✓", "action": "add_member", "target": "группа"},
+        {"action": "send_message", "target": "grp", "text_hash": "abc"},
+        {"action": "add_member", "target": "grp", "user": 42},
+        {"action": "send_message", "target": "grp", "text": "a\x00\u2028\x7f😀", "n": None, "ok": True},
+        {"action": "send_message", "target": "grp", "user": 2**70, "score": 0.1},
+    ],
+    ids=["fast_path", "fast_path_escaping", "generic_schema", "non_str_value", "scalars", "stdlib_fallback"],
+)
+def test_hash_payload_matches_canonical_json(payload):
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    assert hash_payload(payload) == hashlib.sha256(encoded).hexdigest()
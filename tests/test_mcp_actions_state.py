@@ -1,6 +1,16 @@
 import json
 
-from mcp_actions_state import load_json_dict, update_json_dict
+import pytest
+
+import mcp_actions_state
+from mcp_actions_state import (
+    append_json_log,
+    load_json_dict,
+    load_json_log,
+    load_json_log_entry,
+    update_json_dict,
+    write_json_log_snapshot,
+)
 
 
 def test_update_json_dict_roundtrip(tmp_path):
@@ -31,3 +41,161 @@ def test_update_json_dict_root_key_preserves_other_keys(tmp_path):
     assert raw["meta"] == {"version": 1}
     assert "old" in raw["batches"]
     assert raw["batches"]["new"]["id"] == "new"
+
+
+def test_json_log_replays_patches_over_snapshot(tmp_path):
+    path = tmp_path / "batches.json"
+    write_json_log_snapshot(path, {"b1": {"id": "b1", "status": "pending_approval"}}, root_key="batches")
+
+    append_json_log(path, "b1", {"status": "approved"}, root_key="batches")
+    append_json_log(path, "b2", {"id": "b2", "status": "pending_approval"}, root_key="batches")
+
+    state = load_json_log(path, root_key="batches")
+    assert state["b1"] == {"id": "b1", "status": "approved"}
+    assert state["b2"]["id"] == "b2"
+    # snapshot untouched until compaction
+    assert "b2" not in json.loads(path.read_text(encoding="utf-8"))["batches"]
+
+
+def test_json_log_compacts_into_snapshot(tmp_path):
+    path = tmp_path / "batches.json"
+    path.write_text(json.dumps({"meta": {"version": 1}}), encoding="utf-8")
+
+    append_json_log(path, "b1", {"id": "b1", "attempts": 1}, root_key="batches", compact_bytes=1)
+
+    raw = json.loads(path.read_text(encoding="utf-8"))
+    assert raw["meta"] == {"version": 1}
+    assert raw["batches"]["b1"]["attempts"] == 1
+    assert path.with_suffix(".json.log").read_text(encoding="utf-8") == ""
+    assert load_json_log(path, root_key="batches") == {"b1": {"id": "b1", "attempts": 1}}
+
+
+@pytest.mark.parametrize("use_orjson", [True, False], ids=["orjson", "stdlib"])
+def test_json_dict_roundtrip_keeps_unicode(tmp_path, monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(mcp_actions_state, "orjson", None)
+    path = tmp_path / "state.json"
+
+    update_json_dict(path, lambda state: state.update({"k": {"text": "привет"}}))
+
+    assert "привет" in path.read_text(encoding="utf-8")
+    assert load_json_dict(path) == {"k": {"text": "привет"}}
+
+
+def test_load_json_dict_cache_returns_copies_and_sees_rewrites(tmp_path):
+    path = tmp_path / "state.json"
+    update_json_dict(path, lambda state: state.update({"k": {"n": 1}}))
+
+    first = load_json_dict(path)
+    first["k"]["n"] = 99
+    assert load_json_dict(path) == {"k": {"n": 1}}
+
+    # external writer replaces the file: new stat key -> re-read
+    other = tmp_path / "other.json"
+    other.write_text(json.dumps({"k": {"n": 2}}), encoding="utf-8")
+    other.replace(path)
+    assert load_json_dict(path) == {"k": {"n": 2}}
+
+
+def test_local_lock_mode_skips_lock_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(mcp_actions_state, "STATE_LOCK_MODE", "local")
+    path = tmp_path / "nested" / "state.json"
+
+    update_json_dict(path, lambda state: state.update({"foo": "bar"}))
+
+    assert load_json_dict(path) == {"foo": "bar"}
+    assert not path.with_suffix(".json.lock").exists()
+
+
+def test_sync_durability_roundtrip(tmp_path, monkeypatch):
+    monkeypatch.setattr(mcp_actions_state, "STATE_DURABILITY", "sync")
+    path = tmp_path / "state.json"
+
+    update_json_dict(path, lambda state: state.update({"k": "v" * 70000}))
+
+    assert json.loads(path.read_text(encoding="utf-8")) == {"k": "v" * 70000}
+    assert not path.with_suffix(".json.tmp").exists()
+
+    synced_dirs = []
+    monkeypatch.setattr(mcp_actions_state, "_fsync_dir", synced_dirs.append)
+    update_json_dict(path, lambda state: state.update({"k": "w"}))
+    append_json_log(path, "b1", {"id": "b1"})
+    append_json_log(path, "b2", {"id": "b2"})
+    # snapshot rename + log create; a plain append to an existing log needs no dir sync
+    assert synced_dirs == [tmp_path, tmp_path]
+
+
+def test_empty_state_file_reads_as_empty_dict(tmp_path):
+    path = tmp_path / "state.json"
+    path.touch()
+
+    assert load_json_dict(path) == {}
+    assert update_json_dict(path, lambda state: dict(state)) == {}
+
+
+def test_writers_create_missing_state_dir(tmp_path):
+    path = tmp_path / "a" / "b" / "batches.json"
+
+    append_json_log(path, "b1", {"id": "b1"}, root_key="batches")
+    write_json_log_snapshot(tmp_path / "c" / "state.json", {"k": {}})
+
+    assert load_json_log(path, root_key="batches") == {"b1": {"id": "b1"}}
+    assert load_json_dict(tmp_path / "c" / "state.json") == {"k": {}}
+
+
+def test_update_json_dict_skips_rewrite_when_unchanged(tmp_path):
+    path = tmp_path / "state.json"
+    update_json_dict(path, lambda state: state.update({"h": 1000.0}))
+    before = path.stat()
+
+    assert update_json_dict(path, lambda state: state.get("h")) == 1000.0
+
+    after = path.stat()
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+    update_json_dict(path, lambda state: state.update({"h": 2000.0}))
+    assert load_json_dict(path) == {"h": 2000.0}
+
+
+def test_stat_cache_can_be_disabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(mcp_actions_state, "STATE_STAT_CACHE", False)
+    path = tmp_path / "state.json"
+    update_json_dict(path, lambda state: state.update({"k": "a"}))
+    key = mcp_actions_state._stat_key(path)
+
+    # simulate a same-size replace that a coarse-mtime filesystem reports with the same stat key
+    path.write_text(json.dumps({"k": "b"}), encoding="utf-8")
+    monkeypatch.setattr(mcp_actions_state, "_stat_key", lambda _path: key)
+
+    assert load_json_dict(path) == {"k": "b"}
+
+
+def test_update_json_dict_rewrites_file_replaced_with_non_dict(tmp_path):
+    path = tmp_path / "state.json"
+    update_json_dict(path, lambda state: state.update({"a": 1}))
+
+    # another writer replaces the snapshot with valid JSON that is not an object
+    path.write_text(json.dumps([1, 2, 3]), encoding="utf-8")
+    update_json_dict(path, lambda state: state.update({"a": 1}))
+
+    assert json.loads(path.read_text(encoding="utf-8")) == {"a": 1}
+    assert load_json_dict(path) == {"a": 1}
+
+
+def test_load_json_log_replays_only_appended_tail(tmp_path, monkeypatch):
+    path = tmp_path / "idem.json"
+    append_json_log(path, "h1", {"ts": 1.0}, compact_bytes=0)
+    append_json_log(path, "h2", {"ts": 2.0}, compact_bytes=0)
+    assert load_json_log_entry(path, "h1") == {"ts": 1.0}
+
+    parsed = []
+    real_loads = mcp_actions_state._json_loads
+    monkeypatch.setattr(mcp_actions_state, "_json_loads", lambda data: parsed.append(data) or real_loads(data))
+    append_json_log(path, "h3", {"ts": 3.0}, compact_bytes=0)
+    assert load_json_log_entry(path, "h3") == {"ts": 3.0}
+    assert len(parsed) == 1
+
+    # a snapshot rewrite truncates the log: the cached replay must not survive it
+    write_json_log_snapshot(path, {"h9": {"ts": 9.0}})
+    append_json_log(path, "h10", {"ts": 10.0}, compact_bytes=0)
+    assert load_json_log(path) == {"h9": {"ts": 9.0}, "h10": {"ts": 10.0}}
+    assert load_json_log_entry(path, "h1") is None
@@ -1,14 +1,7 @@
-import os
-
 import pytest
 
-os.environ.setdefault("TG_API_ID", "1")
-os.environ.setdefault("TG_API_HASH", "testhash")
-
-import mcp_server_actions as actions
-
 
-def test_create_add_member_batch_record_dedup_and_policy(monkeypatch):
+def test_create_add_member_batch_record_dedup_and_policy(actions, monkeypatch):
     monkeypatch.setattr(
         actions,
         "_check_target_allowed",
@@ -35,7 +28,7 @@ def test_create_add_member_batch_record_dedup_and_policy(monkeypatch):
 
 
 @pytest.mark.asyncio
-async def test_batch_approval_expiry_requires_reapprove(monkeypatch, tmp_path):
+async def test_batch_approval_expiry_requires_reapprove(actions, monkeypatch, tmp_path):
     monkeypatch.setattr(actions, "SAFE_STARTUP_BLOCK_REASON", None)
     monkeypatch.setattr(actions, "ACTIONS_ENABLED", True)
     monkeypatch.setattr(actions, "REQUIRE_ALLOWLIST", False)
@@ -69,10 +62,12 @@ async def test_batch_approval_expiry_requires_reapprove(monkeypatch, tmp_path):
     assert batch is not None
     assert batch["approved"] is False
     assert batch["status"] == "pending_approval"
+    # lock acquire + blocked patch (which clears the lock); no separate release write
+    assert len((tmp_path / "batches.json.log").read_bytes().splitlines()) == 2
 
 
 @pytest.mark.asyncio
-async def test_batch_run_lock_blocks_parallel_worker(monkeypatch, tmp_path):
+async def test_batch_run_lock_blocks_parallel_worker(actions, monkeypatch, tmp_path):
     monkeypatch.setattr(actions, "SAFE_STARTUP_BLOCK_REASON", None)
     monkeypatch.setattr(actions, "ACTIONS_ENABLED", True)
     monkeypatch.setattr(actions, "REQUIRE_ALLOWLIST", False)
@@ -101,3 +96,66 @@ async def test_batch_run_lock_blocks_parallel_worker(monkeypatch, tmp_path):
     result = await actions.tg_run_add_member_batch("b1", max_actions=1)
     assert result["success"] is False
     assert "already running" in str(result.get("error", ""))
+
+
+@pytest.mark.asyncio
+async def test_batch_run_keeps_approved_until_all_pending_processed(actions, monkeypatch, tmp_path):
+    monkeypatch.setattr(actions, "SAFE_STARTUP_BLOCK_REASON", None)
+    monkeypatch.setattr(actions, "ACTIONS_ENABLED", True)
+    monkeypatch.setattr(actions, "REQUIRE_ALLOWLIST", False)
+    monkeypatch.setattr(actions, "IDEMPOTENCY_ENABLED", False)
+    monkeypatch.setattr(actions, "BATCH_FILE", tmp_path / "batches.json")
+    monkeypatch.setattr(actions.time, "time", lambda: 100)
+
+    class _Manager:
+        async def add_member_to_group(self, group, user, dry_run):
+            return {"success": True}
+
+    class _Ctx:
+        current_session = "test"
+        manager = None
+
+        async def get_manager(self):
+            return _Manager()
+
+    monkeypatch.setattr(actions, "ctx", _Ctx())
+
+    state = {
+        "b1": {
+            "id": "b1",
+            "type": "add_member",
+            "status": "approved",
+            "approved": True,
+            "approved_until_ts": 9999,
+            "created_at_ts": 1,
+            "expires_at_ts": 9999999999,
+            "user": "new_user",
+            "actions": [
+                {"group": "g0", "status": "success", "attempts": 1},
+                {"group": "g1", "status": "pending", "attempts": 0},
+                {"group": "g2", "status": "pending", "attempts": 0},
+            ],
+        }
+    }
+    actions._save_batches_state(state)
+
+    first = await actions.tg_run_add_member_batch("b1", max_actions=1)
+    assert first["processed_now"] == 1
+    assert first["status"] == "approved"
+    assert first["pending_count"] == 1
+
+    second = await actions.tg_run_add_member_batch("b1", max_actions=1)
+    assert second["processed_now"] == 1
+    assert second["status"] == "completed"
+    assert second["pending_count"] == 0
+
+
+def test_load_report_parses_bytes_and_stdlib_only_literals(actions, tmp_path):
+    path = tmp_path / "report.json"
+    path.write_text('{"items": [{"group": "группа", "error": "Join quota exceeded"}]}', encoding="utf-8")
+    assert actions._load_report(path)["items"][0]["group"] == "группа"
+
+    path.write_text('{"items": [], "score": NaN}', encoding="utf-8")
+    report = actions._load_report(path)
+    assert report["items"] == []
+    assert report["score"] != report["score"]
@@ -1,33 +1,28 @@
-import os
+import json
 
-os.environ.setdefault("TG_API_ID", "1")
-os.environ.setdefault("TG_API_HASH", "testhash")
 
-import mcp_server_actions as actions
-
-
-def test_validate_confirmation_text_required():
-    actions.REQUIRE_CONFIRMATION_TEXT = True
-    actions.MIN_CONFIRMATION_TEXT_LEN = 6
+def test_validate_confirmation_text_required(actions, monkeypatch):
+    monkeypatch.setattr(actions, "REQUIRE_CONFIRMATION_TEXT", True)
+    monkeypatch.setattr(actions, "MIN_CONFIRMATION_TEXT_LEN", 6)
 
     ok, error = actions._validate_confirmation_text("", dry_run=False)
     assert ok is False
     assert "confirmation_text" in str(error)
 
 
-def test_validate_confirmation_text_not_required_in_dry_run():
-    actions.REQUIRE_CONFIRMATION_TEXT = True
-    actions.MIN_CONFIRMATION_TEXT_LEN = 6
+def test_validate_confirmation_text_not_required_in_dry_run(actions, monkeypatch):
+    monkeypatch.setattr(actions, "REQUIRE_CONFIRMATION_TEXT", True)
+    monkeypatch.setattr(actions, "MIN_CONFIRMATION_TEXT_LEN", 6)
 
     ok, error = actions._validate_confirmation_text("", dry_run=True)
     assert ok is True
     assert error is None
 
 
-def test_idempotency_duplicate_window(tmp_path):
-    actions.IDEMPOTENCY_ENABLED = True
-    actions.IDEMPOTENCY_WINDOW_SEC = 3600
-    actions.IDEMPOTENCY_FILE = tmp_path / "action_idempotency.json"
+def test_idempotency_duplicate_window(actions, monkeypatch, tmp_path):
+    monkeypatch.setattr(actions, "IDEMPOTENCY_ENABLED", True)
+    monkeypatch.setattr(actions, "IDEMPOTENCY_WINDOW_SEC", 3600)
+    monkeypatch.setattr(actions, "IDEMPOTENCY_FILE", tmp_path / "action_idempotency.json")
 
     action_hash = "abc123"
 
@@ -46,23 +41,83 @@ def test_idempotency_duplicate_window(tmp_path):
     assert retry_after == 0
 
 
-def test_hash_payload_is_stable_for_key_order():
+def test_hash_payload_is_stable_for_key_order(actions):
     a = actions._hash_payload({"action": "send", "target": "x", "text": "hello"})
     b = actions._hash_payload({"text": "hello", "target": "x", "action": "send"})
     assert a == b
 
 
-def test_preconditions_blocked_by_safe_startup_guard(monkeypatch):
+def test_preconditions_blocked_by_safe_startup_guard(actions, monkeypatch):
     monkeypatch.setattr(actions, "SAFE_STARTUP_BLOCK_REASON", "unsafe config")
     ok, err = actions._check_action_preconditions("group1", dry_run=True, confirm=False)
     assert ok is False
     assert "unsafe" in str(err)
 
 
-def test_blocked_response_adds_next_step_for_approval_code():
+def test_blocked_response_adds_next_step_for_approval_code(actions):
     result = actions._blocked(
         "Execution blocked: approval_code is required. Run the same action with dry_run=true first."
     )
     assert result["success"] is False
     assert "approval_code" in result["error"]
     assert "dry_run=true" in str(result.get("next_step", ""))
+
+
+def test_suggest_next_step_keeps_cascade_priority_on_overlapping_needles(actions, monkeypatch):
+    monkeypatch.setattr(actions, "CONFIRMATION_PHRASE", "отправляй")
+    # "confirmation_text" shares a suffix/prefix with "too fresh right after dry_run"
+    step = actions._suggest_next_step("bad confirmation_textoo fresh right after dry_run")
+    assert step == "Use exact confirmation_text='отправляй' in this thread."
+    # user text in the error must not outrank an earlier rule
+    step = actions._suggest_next_step("file_path does not exist: /tmp/approval_code/actions are disabled")
+    assert step == "Set TG_ACTIONS_ENABLED=1 for ActionMCP and restart server."
+
+
+def test_mark_actions_executed_records_all_hashes(actions, monkeypatch, tmp_path):
+    monkeypatch.setattr(actions, "IDEMPOTENCY_ENABLED", True)
+    monkeypatch.setattr(actions, "IDEMPOTENCY_WINDOW_SEC", 3600)
+    monkeypatch.setattr(actions, "IDEMPOTENCY_FILE", tmp_path / "action_idempotency.json")
+
+    actions._mark_actions_executed(["h1", "h2"], now_ts=1000.0)
+
+    for action_hash in ("h1", "h2"):
+        duplicate, retry_after = actions._check_recent_duplicate(action_hash, now_ts=1300.0)
+        assert duplicate is True
+        assert retry_after > 0
+
+
+def test_idempotency_log_reads_legacy_snapshot_and_purges_stale(actions, monkeypatch, tmp_path):
+    path = tmp_path / "action_idempotency.json"
+    monkeypatch.setattr(actions, "IDEMPOTENCY_ENABLED", True)
+    monkeypatch.setattr(actions, "IDEMPOTENCY_WINDOW_SEC", 3600)
+    monkeypatch.setattr(actions, "IDEMPOTENCY_FILE", path)
+    monkeypatch.setattr(actions, "IDEMPOTENCY_PURGE_MIN_KEYS", 1)
+    monkeypatch.setattr(actions, "_idempotency_live_keys", 0)
+    # pre-log format: bare float timestamps in the snapshot
+    path.write_text(json.dumps({"old1": 1000.0, "old2": 1000.0, "live": 9000.0}), encoding="utf-8")
+
+    duplicate, _ = actions._check_recent_duplicate("live", now_ts=9100.0)
+    assert duplicate is True
+
+    actions._mark_actions_executed(["new"], now_ts=9200.0)
+
+    assert set(actions._load_idempotency_state()) == {"live", "new"}
+    assert not path.with_suffix(".json.log").read_bytes()
+
+
+def test_approval_trim_drops_expired_prefix_and_consume_checks_expiry(actions, monkeypatch, tmp_path):
+    monkeypatch.setattr(actions, "APPROVAL_FILE", tmp_path / "approvals.json")
+    monkeypatch.setattr(actions, "APPROVAL_MIN_AGE_SEC", 0)
+    monkeypatch.setattr(actions, "APPROVAL_TTL_SEC", 100)
+    first = actions._issue_approval("h1", now_ts=1000.0)["approval_code"]
+    # TTL shortened between issues: the later code expires before the earlier one
+    monkeypatch.setattr(actions, "APPROVAL_TTL_SEC", 10)
+    second = actions._issue_approval("h2", now_ts=1001.0)["approval_code"]
+
+    ok, error = actions._consume_approval("h2", second, now_ts=1050.0)
+    assert ok is False
+    assert "expired" in str(error)
+    assert actions._consume_approval("h1", first, now_ts=1050.0) == (True, None)
+
+    actions._issue_approval("h3", now_ts=2000.0)
+    assert len(actions._load_approvals_state()) == 1
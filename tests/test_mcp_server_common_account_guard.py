@@ -65,3 +65,80 @@ async def test_auth_status_reports_mismatch_as_unauthorized(monkeypatch):
 
     assert payload["authorized"] is False
     assert "Session mismatch" in payload.get("error", "")
+
+
+@pytest.mark.asyncio
+async def test_resolve_username_cached_per_session(monkeypatch):
+    monkeypatch.delenv("TG_EXPECTED_USERNAME", raising=False)
+    ctx = common.MCPServerContext(allow_session_switch=False)
+    await ctx._connect_client(DummyClient(username="me"), "s1")
+
+    calls = []
+
+    async def fake_resolve(username):
+        calls.append(username)
+        return {"id": 1, "type": "user", "username": "alice"}
+
+    monkeypatch.setattr(ctx.manager, "resolve_username", fake_resolve)
+
+    first = await ctx.resolve_username("@Alice")
+    first["id"] = 999
+    assert await ctx.resolve_username("alice") == {"id": 1, "type": "user", "username": "alice"}
+    assert calls == ["@Alice"]
+
+    await ctx._connect_client(DummyClient(username="me"), "s2")
+    monkeypatch.setattr(ctx.manager, "resolve_username", fake_resolve)
+    await ctx.resolve_username("alice")
+    assert calls == ["@Alice", "alice"]
+
+
+@pytest.mark.asyncio
+async def test_use_session_disconnects_previous_and_rechecks_on_switch_back(monkeypatch, tmp_path):
+    monkeypatch.delenv("TG_EXPECTED_USERNAME", raising=False)
+    for name in ("s1", "s2", "s3"):
+        (tmp_path / f"{name}.session").touch()
+
+    class SwitchClient(DummyClient):
+        async def connect(self):
+            self.connected = True
+            self.disconnected = False
+
+        async def disconnect(self):
+            self.connected = False
+            self.disconnected = True
+
+        def is_connected(self):
+            return self.connected
+
+    clients = {}
+    monkeypatch.setattr(
+        common,
+        "get_client_for_session",
+        lambda path: clients.setdefault(path, SwitchClient(username="me")),
+    )
+    ctx = common.MCPServerContext(sessions_dir=str(tmp_path))
+    s1 = str(tmp_path / "s1.session")
+    s2 = str(tmp_path / "s2.session")
+
+    assert (await ctx.use_session("s1"))["switched_to"] == "s1"
+    assert (await ctx.use_session("s2"))["switched_to"] == "s2"
+    assert clients[s1].is_connected() is False
+
+    # session revoked while parked: switch back goes through is_user_authorized again
+    clients[s1]._authorized = False
+    assert "not authorized" in (await ctx.use_session("s1"))["error"]
+    assert ctx.current_session == "s2"
+
+    clients[s1]._authorized = True
+    assert (await ctx.use_session("s1")) == {"switched_to": "s1", "account": "me"}
+    assert ctx.client is clients[s1]
+    assert clients[s2].is_connected() is False
+
+    assert (await ctx.use_session("s3"))["switched_to"] == "s3"
+    # only the current client stays connected
+    assert [path for path, client in clients.items() if client.is_connected()] == [str(tmp_path / "s3.session")]
+
+    # re-selecting the current session is rechecked too, not served from the cached account
+    s3 = str(tmp_path / "s3.session")
+    clients[s3]._authorized = False
+    assert "not authorized" in (await ctx.use_session("s3"))["error"]
@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 os.environ.setdefault("TG_API_ID", "1")
 os.environ.setdefault("TG_API_HASH", "testhash")
 
@@ -28,17 +30,27 @@ def test_batch_write_detection():
     assert tele_client._contains_telethon_write_request([read_req, write_req]) is True
 
 
-def test_send_code_is_blocked_without_auth_bootstrap(monkeypatch):
+@pytest.mark.parametrize(
+    "auth_bootstrap, expected_write",
+    [(False, True), (True, False)],
+    ids=["blocked_without_auth_bootstrap", "allowed_with_auth_bootstrap"],
+)
+def test_send_code_auth_bootstrap(monkeypatch, auth_bootstrap, expected_write):
     req = _dummy_request("telethon.tl.functions.auth", "SendCodeRequest")
-    monkeypatch.setattr(tele_client, "AUTH_BOOTSTRAP_ENABLED", False)
-    assert tele_client._is_telethon_write_request(req) is True
+    monkeypatch.setattr(tele_client, "AUTH_BOOTSTRAP_ENABLED", auth_bootstrap)
+    assert tele_client._is_telethon_write_request(req) is expected_write
 
 
-def test_send_code_is_allowed_with_auth_bootstrap(monkeypatch):
+def test_request_write_table_takes_precedence(monkeypatch):
     req = _dummy_request("telethon.tl.functions.auth", "SendCodeRequest")
+    monkeypatch.setattr(tele_client, "_REQUEST_WRITE_TABLE", {type(req): True})
     monkeypatch.setattr(tele_client, "AUTH_BOOTSTRAP_ENABLED", True)
     assert tele_client._is_telethon_write_request(req) is False
 
+    other = _dummy_request("telethon.tl.functions.messages", "GetHistoryRequest")
+    monkeypatch.setattr(tele_client, "_REQUEST_WRITE_TABLE", {type(other): True})
+    assert tele_client._is_telethon_write_request(other) is True
+
 
 def test_load_api_credentials_from_keychain(monkeypatch):
     monkeypatch.setenv("TG_SECRET_PROVIDER", "keychain")
@@ -53,12 +65,34 @@ def test_load_api_credentials_from_keychain(monkeypatch):
         value = "12345\n" if account == "TG_API_ID" else "hash_from_keychain\n"
         return type("Proc", (), {"returncode": 0, "stdout": value})()
 
+    monkeypatch.setattr(tele_client, "keyring", None)
     monkeypatch.setattr(tele_client.subprocess, "run", fake_run)
     raw_api_id, raw_api_hash = tele_client._load_api_credentials()
     assert raw_api_id == "12345"
     assert raw_api_hash == "hash_from_keychain"
 
 
+def test_load_api_credentials_from_keychain_prefers_keyring(monkeypatch):
+    monkeypatch.setenv("TG_SECRET_PROVIDER", "keychain")
+    monkeypatch.delenv("TG_API_ID", raising=False)
+    monkeypatch.delenv("TG_API_HASH", raising=False)
+    monkeypatch.setenv("TG_KEYCHAIN_SERVICE", "tg-mcp-test")
+    monkeypatch.setattr(tele_client.sys, "platform", "darwin")
+
+    secrets = {"TG_API_ID": "54321", "TG_API_HASH": None}
+    fake_keyring = type("Keyring", (), {"get_password": staticmethod(lambda service, account: secrets[account])})
+    monkeypatch.setattr(tele_client, "keyring", fake_keyring)
+
+    def fake_run(cmd, capture_output, text, check):
+        assert cmd[cmd.index("-a") + 1] == "TG_API_HASH"
+        return type("Proc", (), {"returncode": 0, "stdout": "hash_from_security\n"})()
+
+    monkeypatch.setattr(tele_client.subprocess, "run", fake_run)
+    raw_api_id, raw_api_hash = tele_client._load_api_credentials()
+    assert raw_api_id == "54321"
+    assert raw_api_hash == "hash_from_security"
+
+
 def test_load_api_credentials_from_command_provider(monkeypatch):
     monkeypatch.setenv("TG_SECRET_PROVIDER", "command")
     monkeypatch.delenv("TG_API_ID", raising=False)
@@ -79,26 +113,20 @@ def test_load_api_credentials_from_command_provider(monkeypatch):
     assert raw_api_hash == "hash_from_cmd"
 
 
-def test_enforce_action_process_blocks_non_action_context(monkeypatch):
-    monkeypatch.setattr(tele_client, "WRITE_GUARD_ENABLED", True)
-    monkeypatch.setattr(tele_client, "ALLOW_DIRECT_WRITE", False)
-    monkeypatch.setattr(tele_client, "ENFORCE_ACTION_PROCESS", True)
-    monkeypatch.setattr(tele_client, "WRITE_CONTEXT", "actions_mcp")
-    monkeypatch.setattr(tele_client, "WRITE_ALLOWED_CONTEXTS", {"actions_mcp"})
-    monkeypatch.setattr(tele_client, "_is_actions_process", lambda: False)
-
-    assert tele_client._is_direct_write_allowed() is False
-
-
-def test_enforce_action_process_allows_real_action_process(monkeypatch):
+@pytest.mark.parametrize(
+    "is_action_process, expected",
+    [(False, False), (True, True)],
+    ids=["blocks_non_action_context", "allows_real_action_process"],
+)
+def test_enforce_action_process(monkeypatch, is_action_process, expected):
     monkeypatch.setattr(tele_client, "WRITE_GUARD_ENABLED", True)
     monkeypatch.setattr(tele_client, "ALLOW_DIRECT_WRITE", False)
     monkeypatch.setattr(tele_client, "ENFORCE_ACTION_PROCESS", True)
     monkeypatch.setattr(tele_client, "WRITE_CONTEXT", "actions_mcp")
     monkeypatch.setattr(tele_client, "WRITE_ALLOWED_CONTEXTS", {"actions_mcp"})
-    monkeypatch.setattr(tele_client, "_is_actions_process", lambda: True)
+    monkeypatch.setattr(tele_client, "_is_actions_process", lambda: is_action_process)
 
-    assert tele_client._is_direct_write_allowed() is True
+    assert tele_client._is_direct_write_allowed() is expected
 
 
 def test_get_client_disables_updates_loop_by_default(monkeypatch, tmp_path):
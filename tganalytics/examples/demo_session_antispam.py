@@ -14,6 +14,9 @@
 """
 
 import asyncio
+import os
+import sys
+import textwrap
 import time
 from pathlib import Path
 from typing import Optional
@@ -23,6 +26,7 @@ from tganalytics.infra.limiter import (
     safe_call,
     get_rate_limiter,
     smart_pause,
+    RateLimiter,
 )
 from tganalytics.domain.groups import GroupManager
 from tganalytics.infra.metrics import snapshot
@@ -72,6 +76,58 @@ def print_error(text: str):
     print(f"{Colors.RED}❌ {text}{Colors.END}")
 
 
+class LineBuffer:
+    """Копит строки таблицы и выводит их одним write вместо print на строку."""
+
+    def __init__(self):
+        self.lines: list[str] = []
+
+    def add(self, line: str) -> None:
+        self.lines.append(line)
+
+    def flush(self) -> None:
+        if self.lines:
+            sys.stdout.write("\n".join(self.lines) + "\n")
+            self.lines.clear()
+
+
+_LIMITER: Optional[RateLimiter] = None
+
+
+def _limiter() -> RateLimiter:
+    """Limiter процесса, резолвится один раз на все этапы демо (лениво)."""
+    global _LIMITER
+    if _LIMITER is None:
+        _LIMITER = get_rate_limiter()
+    return _LIMITER
+
+
+async def get_me_cached(client):
+    """get_me через safe_call один раз на клиента: me в рамках сессии не меняется."""
+    me = getattr(client, "_cached_me", None)
+    if me is None:
+        me = await safe_call(client.get_me, operation_type="api")
+        client._cached_me = me
+    return me
+
+
+async def ainput(prompt: str) -> str:
+    """input() в отдельном потоке: event loop (и Telethon) не замирает на паузах."""
+    return await asyncio.to_thread(input, prompt)
+
+
+SESSIONS_DIR = "data/sessions"
+DEMO_SESSION_NAME = "demo_session.session"
+
+
+def _stat_or_none(path: str) -> Optional[os.stat_result]:
+    """Один stat вместо пары exists() + stat()."""
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
 # ============================================================================
 # ЭТАП 1: Session Management
 # ============================================================================
@@ -80,15 +136,15 @@ async def demo_session_management():
     """Демонстрация работы с session-файлами"""
     print_header("ЭТАП 1: Session Management")
     
-    session_path = "data/sessions/demo_session.session"
-    session_file = Path(session_path)
+    session_path = f"{SESSIONS_DIR}/{DEMO_SESSION_NAME}"
     
     print_step(1, "Проверка существования session-файла")
-    if session_file.exists():
+    session_stat = _stat_or_none(session_path)
+    if session_stat is not None:
         print_success(f"Session файл найден: {session_path}")
         
         # Показываем права доступа
-        file_mode = session_file.stat().st_mode & 0o777
+        file_mode = session_stat.st_mode & 0o777
         mode_str = oct(file_mode)
         print_info(f"Права доступа: {mode_str}")
         
@@ -98,8 +154,7 @@ async def demo_session_management():
             print_warning(f"Права доступа должны быть 600, текущие: {mode_str}")
         
         # Показываем размер файла
-        size = session_file.stat().st_size
-        print_info(f"Размер файла: {size} байт")
+        print_info(f"Размер файла: {session_stat.st_size} байт")
         
     else:
         print_warning(f"Session файл не найден: {session_path}")
@@ -118,10 +173,10 @@ async def demo_session_management():
     
     try:
         await client.start()
-        me = await safe_call(client.get_me, operation_type="api")
+        me = await get_me_cached(client)
         print_success(f"Авторизация успешна: @{me.username} (ID: {me.id})")
         
-        if session_file.exists():
+        if session_stat is not None:
             print_info("✅ Session использован для автоматической авторизации")
         else:
             print_info("✅ Новый session создан и сохранен")
@@ -131,8 +186,10 @@ async def demo_session_management():
         return None
     
     print_step(4, "Проверка безопасности session после создания")
-    if session_file.exists():
-        file_mode = session_file.stat().st_mode & 0o777
+    # Один повторный stat: get_client_for_session мог поправить права (chmod 600)
+    session_stat = _stat_or_none(session_path)
+    if session_stat is not None:
+        file_mode = session_stat.st_mode & 0o777
         if file_mode == 0o600:
             print_success("Права доступа установлены корректно (600)")
         else:
@@ -149,7 +206,7 @@ async def demo_rate_limiter():
     """Демонстрация работы Token Bucket"""
     print_header("ЭТАП 2: Rate Limiter (Token Bucket)")
     
-    limiter = get_rate_limiter()
+    limiter = _limiter()
     bucket = limiter.bucket
     
     print_step(1, "Текущее состояние Token Bucket")
@@ -158,20 +215,36 @@ async def demo_rate_limiter():
     print_info(f"Текущее количество токенов: {bucket.tokens:.2f}")
     
     print_step(2, "Демонстрация работы Token Bucket")
-    print_info("Делаем 10 быстрых запросов подряд...")
+    burst = 10
+    if bucket.tokens >= burst:
+        # Полный bucket отдал бы все запросы мгновенно — замерять нечего.
+        # Сначала сливаем его, чтобы burst упирался в скорость пополнения.
+        await bucket.acquire(int(bucket.tokens))
+        print_info("Bucket был полон — слили токены, замеряем запросы на пополнении")
+    print_info(f"Отправляем {burst} запросов одновременно (burst)...")
     print_info("Ожидаем: первые запросы пройдут быстро, затем начнется throttling\n")
     
+    # Все запросы стартуют разом и конкурируют за bucket; фиксируем момент
+    # завершения каждого и остаток токенов в этот момент.
+    finished: dict[int, tuple[float, float]] = {}
+    start = time.perf_counter()
+    tasks = []
+    for i in range(burst):
+        task = asyncio.create_task(bucket.acquire(1))
+        task.add_done_callback(
+            lambda _t, i=i: finished.__setitem__(i, (time.perf_counter() - start, bucket.tokens))
+        )
+        tasks.append(task)
+    await asyncio.gather(*tasks)
+    
     wait_times = []
-    for i in range(10):
-        start = time.perf_counter()
-        await bucket.acquire(1)
-        elapsed = time.perf_counter() - start
-        
+    rows = LineBuffer()
+    for i in range(burst):
+        elapsed, tokens_left = finished[i]
         wait_times.append(elapsed)
-        tokens_left = bucket.tokens
-        
         status = "✅" if elapsed < 0.1 else "⏳"
-        print(f"  {status} Запрос {i+1:2d}: ожидание {elapsed:.3f}с, токенов осталось: {tokens_left:.2f}")
+        rows.add(f"  {status} Запрос {i+1:2d}: ожидание {elapsed:.3f}с, токенов осталось: {tokens_left:.2f}")
+    rows.flush()
     
     avg_wait = sum(wait_times) / len(wait_times)
     print_info(f"\nСреднее время ожидания: {avg_wait:.3f}с")
@@ -206,20 +279,16 @@ async def demo_safe_call(client):
     print("    # Автоматически: rate limiting + retry при FLOOD_WAIT")
     
     print_step(2, "Демонстрация safe_call в действии")
-    print_info("Делаем несколько API вызовов через safe_call...\n")
+    print_info("Один реальный API вызов через safe_call (burst токенов показан в этапе 2)\n")
     
-    for i in range(5):
-        start = time.perf_counter()
-        try:
-            me = await safe_call(client.get_me, operation_type="api")
-            elapsed = time.perf_counter() - start
-            print_success(f"Вызов {i+1}: успех за {elapsed:.3f}с (@{me.username})")
-        except Exception as e:
-            elapsed = time.perf_counter() - start
-            print_error(f"Вызов {i+1}: ошибка за {elapsed:.3f}с - {e}")
-        
-        # Небольшая пауза между вызовами
-        await asyncio.sleep(0.3)
+    start = time.perf_counter()
+    try:
+        me = await safe_call(client.get_me, operation_type="api")
+        client._cached_me = me
+        print_success(f"Вызов: успех за {time.perf_counter() - start:.3f}с (@{me.username})")
+    except Exception as e:
+        print_error(f"Вызов: ошибка за {time.perf_counter() - start:.3f}с - {e}")
+    print_info("Identity аккаунта в сессии не меняется: дальше me берется из кеша (get_me_cached)")
     
     print_step(3, "Что происходит внутри safe_call:")
     print_info("1. Проверка квот (если operation_type='dm' или 'join')")
@@ -239,12 +308,13 @@ async def demo_quotas():
     """Демонстрация работы квот"""
     print_header("ЭТАП 4: Квоты (Daily Limits)")
     
-    limiter = get_rate_limiter()
+    limiter = _limiter()
     
     print_step(1, "Текущие квоты и счетчики")
     stats = limiter.get_stats()
+    dm_used, dm_total = stats['dm_usage'].split('/')
     
-    print_info(f"DM квота: {stats['dm_usage']} (лимит: {limiter.max_dm_per_day}/день)")
+    print_info(f"DM квота: {stats['dm_usage']} (лимит: {dm_total}/день)")
     print_info(f"Join квота: {stats['join_usage']} (лимит: {limiter.max_joins_per_day}/день)")
     print_info(f"API вызовов сегодня: {stats['api_calls']}")
     print_info(f"FLOOD_WAIT событий: {stats['flood_waits']}")
@@ -254,10 +324,8 @@ async def demo_quotas():
     if counter_file.exists():
         print_info(f"Файл счетчиков: {counter_file}")
         print_info("Содержимое:")
-        content = counter_file.read_text()
-        for line in content.strip().split('\n'):
-            if line.strip():
-                print(f"  {line}")
+        content = counter_file.read_bytes().decode('utf-8')
+        print(textwrap.indent(content.strip(), '  '))
         print_success("✅ Счетчики сохраняются между запусками")
     else:
         print_warning("Файл счетчиков не найден (будет создан при первом использовании)")
@@ -267,7 +335,7 @@ async def demo_quotas():
     
     can_send_dm = await limiter.check_dm_quota()
     if can_send_dm:
-        print_success(f"✅ Можно отправить DM (использовано: {stats['dm_usage'].split('/')[0]}/{limiter.max_dm_per_day})")
+        print_success(f"✅ Можно отправить DM (использовано: {dm_used}/{dm_total})")
     else:
         print_warning(f"⚠️  Квота DM исчерпана ({stats['dm_usage']})")
     
@@ -296,7 +364,7 @@ async def demo_integration(client):
     print_info("(Используй username группы или ID, например: 's16_space' или '-1002188344480')")
     
     # Можно использовать тестовую группу или попросить пользователя ввести
-    group_id = input(f"{Colors.CYAN}Введите ID/username группы (или Enter для пропуска): {Colors.END}").strip()
+    group_id = (await ainput(f"{Colors.CYAN}Введите ID/username группы (или Enter для пропуска): {Colors.END}")).strip()
     
     if group_id:
         try:
@@ -315,7 +383,7 @@ async def demo_integration(client):
         print_info("Пропущено (демо без реального запроса)")
     
     print_step(3, "Статистика работы системы")
-    limiter = get_rate_limiter()
+    limiter = _limiter()
     stats = limiter.get_stats()
     metrics = snapshot()
     
@@ -332,9 +400,11 @@ async def demo_integration(client):
     if total_calls > 0:
         print(f"  • Всего вызовов с метриками: {total_calls}")
         print_info("  Распределение задержек:")
+        rows = LineBuffer()
         for bucket, count in latency_buckets.items():
             if count > 0:
-                print(f"    ≤{bucket}с: {count} вызовов")
+                rows.add(f"    ≤{bucket}с: {count} вызовов")
+        rows.flush()
     
     print_success("✅ Все компоненты работают вместе автоматически")
 
@@ -354,7 +424,7 @@ async def main():
     print("  4. Квоты - ежедневные лимиты операций")
     print("  5. Интеграция - реальный пример использования")
     
-    input(f"\n{Colors.CYAN}Нажмите Enter для начала демо...{Colors.END}")
+    await ainput(f"\n{Colors.CYAN}Нажмите Enter для начала демо...{Colors.END}")
     
     # ЭТАП 1: Session Management
     client = await demo_session_management()
@@ -362,22 +432,22 @@ async def main():
         print_error("Не удалось инициализировать клиент. Демо прервано.")
         return
     
-    input(f"\n{Colors.CYAN}Нажмите Enter для продолжения...{Colors.END}")
+    await ainput(f"\n{Colors.CYAN}Нажмите Enter для продолжения...{Colors.END}")
     
     # ЭТАП 2: Rate Limiter
     await demo_rate_limiter()
     
-    input(f"\n{Colors.CYAN}Нажмите Enter для продолжения...{Colors.END}")
+    await ainput(f"\n{Colors.CYAN}Нажмите Enter для продолжения...{Colors.END}")
     
     # ЭТАП 3: Safe Call
     await demo_safe_call(client)
     
-    input(f"\n{Colors.CYAN}Нажмите Enter для продолжения...{Colors.END}")
+    await ainput(f"\n{Colors.CYAN}Нажмите Enter для продолжения...{Colors.END}")
     
     # ЭТАП 4: Квоты
     await demo_quotas()
     
-    input(f"\n{Colors.CYAN}Нажмите Enter для продолжения...{Colors.END}")
+    await ainput(f"\n{Colors.CYAN}Нажмите Enter для продолжения...{Colors.END}")
     
     # ЭТАП 5: Интеграция
     await demo_integration(client)
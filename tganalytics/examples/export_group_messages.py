@@ -10,9 +10,11 @@
 
 import asyncio
 import json
+import os
 import sys
+import time
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional, Dict, Any, List
 import argparse
 
@@ -20,35 +22,69 @@ import argparse
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 PKG_DIR = PROJECT_ROOT / "packages"
 TG_CORE_DIR = PKG_DIR / "tg_core"
+_sys_path = set(sys.path)
 for p in (str(PKG_DIR), str(TG_CORE_DIR)):
-    if p not in sys.path:
+    if p not in _sys_path:
         sys.path.insert(0, p)
+        _sys_path.add(p)
 
 from tganalytics.infra.tele_client import get_client, get_client_for_session
 from tganalytics.infra.limiter import get_rate_limiter, safe_call
 from tganalytics.domain.groups import GroupManager
 
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None
+
+
+WRITE_BATCH_SIZE = 500
+
+# Символы, недопустимые/неудобные в имени файла (включая Windows: \ и :)
+_SAFE_NAME_TRANS = str.maketrans({' ': '_', '/': '_', '\\': '_', ':': '_'})
+
+
+def _dumps(obj: Any) -> bytes:
+    """Компактный UTF-8 JSON: orjson, если установлен, иначе stdlib json."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _write_messages_batch(f, batch: List[Dict[str, Any]], needs_separator: bool) -> None:
+    """Дописывает пачку сообщений в открытый JSON-массив (вызывается через to_thread)."""
+    chunk = b',\n'.join(_dumps(msg) for msg in batch)
+    f.write(b',\n' + chunk if needs_separator else chunk)
+
+
+def _now_iso() -> str:
+    """RFC 3339 в UTC с точностью до секунд (для метаданных выгрузки)."""
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+async def _aiter_list(items: List[Dict[str, Any]]):
+    for item in items:
+        yield item
+
 
 async def find_group_by_title(client, title: str) -> Optional[Any]:
     """Находит группу по названию через список диалогов"""
+    needle = title.lower()
+
     async def search_dialogs():
-        dialogs = []
+        # точное совпадение — сразу выходим, иначе помним только первое по подстроке
+        first_partial = None
         async for dialog in client.iter_dialogs():
-            if dialog.title and title.lower() in dialog.title.lower():
-                dialogs.append(dialog)
-        return dialogs
-    
-    dialogs = await safe_call(search_dialogs, operation_type="api")
-    
-    if not dialogs:
-        return None
-    
-    # Если несколько совпадений - возвращаем первое точное или первое
-    for dialog in dialogs:
-        if dialog.title.lower() == title.lower():
-            return dialog
-    
-    return dialogs[0]
+            if not dialog.title:
+                continue
+            dialog_title = dialog.title.lower()
+            if dialog_title == needle:
+                return dialog
+            if first_partial is None and needle in dialog_title:
+                first_partial = dialog
+        return first_partial
+
+    return await safe_call(search_dialogs, operation_type="api")
 
 
 async def export_messages_safe(
@@ -56,7 +92,8 @@ async def export_messages_safe(
     group_identifier: str,
     output_file: str,
     limit: Optional[int] = None,
-    min_id: int = 0
+    min_id: int = 0,
+    workers: int = 1,
 ) -> Dict[str, Any]:
     """
     Безопасно выгружает сообщения группы используя существующую инфраструктуру
@@ -67,6 +104,7 @@ async def export_messages_safe(
         output_file: Путь к файлу для сохранения
         limit: Максимальное количество сообщений (None = все)
         min_id: Минимальный ID сообщения (для продолжения выгрузки)
+        workers: Сколько окон истории качать параллельно (1 = потоковая выгрузка)
     
     Returns:
         Словарь со статистикой выгрузки
@@ -96,39 +134,67 @@ async def export_messages_safe(
     else:
         print(f"   Лимит: все сообщения")
     
-    start_time = datetime.now()
+    start_ns = time.monotonic_ns()
+    
+    output_path = Path(output_file)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
     
+    # Пишем сообщения в файл потоково, не держа всю выгрузку в памяти.
+    # Блок "group" идёт после массива — итоговые счётчики известны только в конце.
     # Используем метод из GroupManager (вся антиспам защита уже внутри)
     # Передаем ID группы, а не название
-    messages = await manager.get_messages(group_id, limit=limit, min_id=min_id)
+    # Сериализация и запись идут пачками в отдельном потоке, чтобы не
+    # блокировать event loop (keepalive клиента, ожидания limiter'а).
+    messages_count = 0
+    max_message_id = None  # максимальный ID за выгрузку (порядок источника не важен)
+    batch: List[Dict[str, Any]] = []
+    # Пишем во временный .part рядом с целевым файлом: обрыв на середине
+    # (FLOOD_WAIT, сеть) не оставляет битый JSON и не затирает прошлую выгрузку.
+    part_path = output_path.with_name(output_path.name + '.part')
+    try:
+        with open(part_path, 'wb') as f:
+            f.write(b'{"messages": [\n')
+            if workers > 1 and not limit:
+                # Параллельные окна отдают готовый список — память O(N), зато меньше RTT
+                messages = await manager.get_messages_parallel(group_id, min_id=min_id, workers=workers)
+                source = _aiter_list(messages)
+            else:
+                source = manager.iter_messages(group_id, limit=limit, min_id=min_id)
+            async for msg in source:
+                batch.append(msg)
+                if max_message_id is None or msg['id'] > max_message_id:
+                    max_message_id = msg['id']
+                if len(batch) >= WRITE_BATCH_SIZE:
+                    await asyncio.to_thread(_write_messages_batch, f, batch, messages_count > 0)
+                    messages_count += len(batch)
+                    batch = []
+            if batch:
+                await asyncio.to_thread(_write_messages_batch, f, batch, messages_count > 0)
+                messages_count += len(batch)
+        
+            group_block = {
+                'id': group_id,
+                'title': group_title,
+                'export_date': _now_iso(),
+                'total_messages': messages_count,
+                'min_id': min_id,
+                'last_message_id': max_message_id,
+            }
+            f.write(b'\n], "group": ')
+            f.write(_dumps(group_block))
+            f.write(b'}\n')
+        os.replace(part_path, output_path)
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
     
-    elapsed_time = (datetime.now() - start_time).total_seconds()
-    last_message_id = messages[-1]['id'] if messages else None
+    elapsed_time = (time.monotonic_ns() - start_ns) / 1e9
     
     print(f"\n✅ Выгрузка завершена!")
-    print(f"   Сообщений выгружено: {len(messages)}")
+    print(f"   Сообщений выгружено: {messages_count}")
     print(f"   Время: {elapsed_time:.1f} секунд")
     if elapsed_time > 0:
-        print(f"   Скорость: {len(messages) / elapsed_time:.1f} msg/sec")
-    
-    # Сохраняем в JSON
-    output_path = Path(output_file)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    export_data = {
-        'group': {
-            'id': group_id,
-            'title': group_title,
-            'export_date': datetime.now().isoformat(),
-            'total_messages': len(messages),
-            'min_id': min_id,
-            'last_message_id': last_message_id,
-        },
-        'messages': messages
-    }
-    
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(export_data, f, ensure_ascii=False, indent=2)
+        print(f"   Скорость: {messages_count / elapsed_time:.1f} msg/sec")
     
     print(f"💾 Данные сохранены в: {output_path}")
     print(f"   Размер файла: {output_path.stat().st_size / 1024 / 1024:.2f} MB")
@@ -143,7 +209,7 @@ async def export_messages_safe(
     return {
         'group_id': group_id,
         'group_title': group_title,
-        'messages_count': len(messages),
+        'messages_count': messages_count,
         'output_file': str(output_path),
         'elapsed_seconds': elapsed_time,
         'api_calls': stats['api_calls'],
@@ -176,6 +242,13 @@ async def main():
         default=0,
         help='Минимальный ID сообщения (для продолжения выгрузки)'
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Параллельные окна истории для полной выгрузки без --limit (по умолчанию: 1, потоково). '
+             'При >1 вся история держится в памяти до записи файла'
+    )
     parser.add_argument(
         '--session-name',
         default=None,
@@ -189,7 +262,7 @@ async def main():
         output_file = args.output
     else:
         # Используем безопасное имя файла
-        safe_name = args.group.replace(' ', '_').replace('/', '_')
+        safe_name = args.group.translate(_SAFE_NAME_TRANS)
         output_file = f"data/export/messages_{safe_name}.json"
     
     print("🚀 Запуск выгрузки переписки группы")
@@ -214,7 +287,8 @@ async def main():
             args.group,
             output_file,
             limit=args.limit,
-            min_id=args.min_id
+            min_id=args.min_id,
+            workers=args.workers,
         )
         
         print(f"\n🎉 Выгрузка успешно завершена!")
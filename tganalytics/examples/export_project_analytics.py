@@ -19,6 +19,7 @@ Usage:
 import argparse
 import asyncio
 import json
+import re
 import sys
 from dataclasses import dataclass
 from datetime import datetime
@@ -29,14 +30,21 @@ from typing import Any, Dict, List, Optional, Tuple
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 PKG_DIR = PROJECT_ROOT / "packages"
 TG_CORE_DIR = PKG_DIR / "tg_core"
+_sys_path = set(sys.path)
 for p in (str(PKG_DIR), str(TG_CORE_DIR)):
-    if p not in sys.path:
+    if p not in _sys_path:
         sys.path.insert(0, p)
+        _sys_path.add(p)
 
 from tganalytics.infra.tele_client import get_client, get_client_for_session
 from tganalytics.infra.limiter import get_rate_limiter, safe_call
 from tganalytics.domain.groups import GroupManager
 
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None
+
 
 @dataclass(frozen=True)
 class ResolvedGroup:
@@ -46,18 +54,11 @@ class ResolvedGroup:
     username: Optional[str]
 
 
-def _now_stamp() -> str:
-    return datetime.now().strftime("%Y-%m-%d")
+_SLUG_TRANS = str.maketrans({" ": "_", "/": "_", "\\": "_", ":": "_"})
 
 
 def _slugify(s: str) -> str:
-    return (
-        s.strip()
-        .replace(" ", "_")
-        .replace("/", "_")
-        .replace("\\", "_")
-        .replace(":", "_")
-    )
+    return s.strip().translate(_SLUG_TRANS)
 
 
 def _raw_dir(workspace: str) -> Path:
@@ -77,26 +78,63 @@ def _load_groups_from_file(path: str) -> List[str]:
     return items
 
 
-async def find_group_by_title(client, title: str) -> Optional[Any]:
-    async def search_dialogs():
-        dialogs = []
+_USERNAME_RE = re.compile(r"[A-Za-z][A-Za-z0-9_]{3,31}")
+
+
+def _looks_like_id_or_username(s: str) -> bool:
+    s = s.strip()
+    return s.startswith("@") or s.lstrip("-").isdigit() or _USERNAME_RE.fullmatch(s) is not None
+
+
+async def _collect_title_index(client) -> Dict[str, Any]:
+    """One iter_dialogs pass -> {title.lower(): dialog}; first dialog wins on duplicate titles."""
+
+    async def load_dialogs():
+        index: Dict[str, Any] = {}
         async for dialog in client.iter_dialogs():
-            if dialog.title and title.lower() in dialog.title.lower():
-                dialogs.append(dialog)
-        return dialogs
+            if dialog.title:
+                index.setdefault(dialog.title.lower(), dialog)
+        return index
+
+    return await safe_call(load_dialogs, operation_type="api")
+
+
+async def find_group_by_title(
+    client, title: str, title_index: Optional[Dict[str, Any]] = None
+) -> Optional[Any]:
+    needle = title.lower()
+    if title_index is not None:
+        exact = title_index.get(needle)
+        if exact is not None:
+            return exact
+        return next((d for t, d in title_index.items() if needle in t), None)
 
-    dialogs = await safe_call(search_dialogs, operation_type="api")
-    if not dialogs:
-        return None
+    async def search_dialogs():
+        # exact title wins immediately; otherwise keep only the first partial match
+        first_partial = None
+        async for dialog in client.iter_dialogs():
+            if not dialog.title:
+                continue
+            dialog_title = dialog.title.lower()
+            if dialog_title == needle:
+                return dialog
+            if first_partial is None and needle in dialog_title:
+                first_partial = dialog
+        return first_partial
 
-    for dialog in dialogs:
-        if dialog.title.lower() == title.lower():
-            return dialog
-    return dialogs[0]
+    return await safe_call(search_dialogs, operation_type="api")
 
 
-async def resolve_group(client, manager: GroupManager, group_identifier: str) -> ResolvedGroup:
-    group_info = await manager.get_group_info(group_identifier)
+async def resolve_group(
+    client,
+    manager: GroupManager,
+    group_identifier: str,
+    title_index: Optional[Dict[str, Any]] = None,
+) -> ResolvedGroup:
+    # titles ("attia project") can't resolve via get_entity: go straight to the dialog scan
+    group_info = None
+    if _looks_like_id_or_username(group_identifier):
+        group_info = await manager.get_group_info(group_identifier)
     if group_info:
         return ResolvedGroup(
             identifier=group_identifier,
@@ -105,7 +143,7 @@ async def resolve_group(client, manager: GroupManager, group_identifier: str) ->
             username=group_info.get("username"),
         )
 
-    entity = await find_group_by_title(client, group_identifier)
+    entity = await find_group_by_title(client, group_identifier, title_index)
     if not entity:
         raise ValueError(f"group not found: {group_identifier}")
 
@@ -117,10 +155,17 @@ async def resolve_group(client, manager: GroupManager, group_identifier: str) ->
     )
 
 
+def _dumps_pretty(data: Any) -> bytes:
+    """Indented UTF-8 JSON; orjson when installed, same layout as json indent=2."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
 def _write_json(path: Path, data: Dict[str, Any]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # serialize once and issue a single write; json.dump streams tiny chunks
+    path.write_bytes(_dumps_pretty(data))
 
 
 async def export_one_group(
@@ -132,22 +177,26 @@ async def export_one_group(
     messages_limit: Optional[int],
     min_id: int,
     export_participants_csv: bool,
+    stamp: str,
+    export_date: str,
+    title_index: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
-    resolved = await resolve_group(client, manager, group_identifier)
-    stamp = _now_stamp()
+    resolved = await resolve_group(client, manager, group_identifier, title_index)
     group_slug = _slugify(resolved.title) or str(resolved.group_id)
 
     # participants
     participants = await manager.get_participants(resolved.group_id, limit=participants_limit)
     participants_path = raw_out / f"{stamp}__tg__participants__{resolved.group_id}__{group_slug}.json"
-    _write_json(
+    # serialize/write off the event loop so other groups keep exporting meanwhile
+    await asyncio.to_thread(
+        _write_json,
         participants_path,
         {
             "group": {
                 "id": resolved.group_id,
                 "title": resolved.title,
                 "username": resolved.username,
-                "export_date": datetime.now().isoformat(),
+                "export_date": export_date,
                 "limit": participants_limit,
                 "total_participants_exported": len(participants),
             },
@@ -170,14 +219,15 @@ async def export_one_group(
     messages = await manager.get_messages(resolved.group_id, limit=messages_limit, min_id=min_id)
     last_message_id = messages[-1]["id"] if messages else None
     messages_path = raw_out / f"{stamp}__tg__messages__{resolved.group_id}__{group_slug}.json"
-    _write_json(
+    await asyncio.to_thread(
+        _write_json,
         messages_path,
         {
             "group": {
                 "id": resolved.group_id,
                 "title": resolved.title,
                 "username": resolved.username,
-                "export_date": datetime.now().isoformat(),
+                "export_date": export_date,
                 "min_id": min_id,
                 "last_message_id": last_message_id,
                 "total_messages_exported": len(messages),
@@ -213,6 +263,7 @@ async def main() -> None:
     parser.add_argument("--messages-limit", type=int, default=5000, help="Max messages per group (default 5000)")
     parser.add_argument("--min-id", type=int, default=0, help="Min message id (for incremental export)")
     parser.add_argument("--no-participants-csv", action="store_true", help="Do not export participants CSV")
+    parser.add_argument("--concurrency", type=int, default=1, help="Groups exported in parallel (default 1: sequential, one account)")
     args = parser.parse_args()
 
     groups: List[str] = []
@@ -227,6 +278,11 @@ async def main() -> None:
     raw_out = _raw_dir(args.workspace)
     raw_out.mkdir(parents=True, exist_ok=True)
 
+    # one timestamp per run: every file of this export shares the same stamp/export_date
+    run_ts = datetime.now()
+    stamp = run_ts.date().isoformat()  # YYYY-MM-DD, no strftime format parsing
+    export_date = run_ts.isoformat()
+
     print("🚀 export project analytics")
     print(f"   workspace: {args.workspace}")
     print(f"   raw out:   {raw_out}")
@@ -244,31 +300,53 @@ async def main() -> None:
         await client.start()
         manager = GroupManager(client)
 
-        results: List[Dict[str, Any]] = []
-        for g in groups:
+        # title inputs share one dialog scan per run instead of one iter_dialogs per group
+        title_index = None
+        if any(not _looks_like_id_or_username(g) for g in groups):
+            title_index = await _collect_title_index(client)
+
+        # groups are exported concurrently (bounded); safe_call/rate limiter still sets the RPS
+        semaphore = asyncio.Semaphore(max(1, args.concurrency))
+
+        async def bounded(g: str) -> Dict[str, Any]:
+            async with semaphore:
+                res = await export_one_group(
+                    client=client,
+                    manager=manager,
+                    raw_out=raw_out,
+                    group_identifier=g,
+                    participants_limit=args.participants_limit,
+                    messages_limit=args.messages_limit,
+                    min_id=args.min_id,
+                    export_participants_csv=(not args.no_participants_csv),
+                    stamp=stamp,
+                    export_date=export_date,
+                    title_index=title_index,
+                )
             print(f"📌 group: {g}")
-            res = await export_one_group(
-                client=client,
-                manager=manager,
-                raw_out=raw_out,
-                group_identifier=g,
-                participants_limit=args.participants_limit,
-                messages_limit=args.messages_limit,
-                min_id=args.min_id,
-                export_participants_csv=(not args.no_participants_csv),
-            )
-            results.append(res)
             print(f"   participants: {res['participants_exported']}")
             print(f"   messages:      {res['messages_exported']}")
             print()
+            return res
+
+        outcomes = await asyncio.gather(*(bounded(g) for g in groups), return_exceptions=True)
+        results: List[Dict[str, Any]] = []
+        failed: List[str] = []
+        for g, outcome in zip(groups, outcomes):
+            if isinstance(outcome, BaseException):
+                print(f"❌ group: {g}: {outcome}")
+                results.append({"identifier": g, "error": str(outcome)})
+                failed.append(g)
+            else:
+                results.append(outcome)
 
         limiter = get_rate_limiter()
         stats = limiter.get_stats()
-        report_path = raw_out / f"{_now_stamp()}__tg__export_report.json"
+        report_path = raw_out / f"{stamp}__tg__export_report.json"
         _write_json(
             report_path,
             {
-                "export_date": datetime.now().isoformat(),
+                "export_date": export_date,
                 "workspace": args.workspace,
                 "groups": results,
                 "anti_spam_stats": stats,
@@ -278,6 +356,8 @@ async def main() -> None:
         print("✅ done")
         print(f"   report: {report_path}")
         print(f"   api calls: {stats.get('api_calls')}, flood waits: {stats.get('flood_waits')}")
+        if failed:
+            raise SystemExit(f"{len(failed)} group(s) failed: {', '.join(failed)}")
 
     finally:
         await client.disconnect()
@@ -42,43 +42,36 @@ async def get_my_chats_with_details():
         
         groups_data = []
         
+        # Информацию о группах/каналах запрашиваем одновременно: GroupManager
+        # сам ходит через safe_call, так что темп по-прежнему задает rate limiter
+        group_dialogs = [d for d in dialogs if not d.is_user and (d.is_group or d.is_channel)]
+        infos = await asyncio.gather(
+            *(manager.get_group_info(d.id) for d in group_dialogs),
+            return_exceptions=True,
+        )
+        info_by_id = dict(zip((d.id for d in group_dialogs), infos))
+        
         for dialog in dialogs:
             # Определяем тип чата
             if dialog.is_user:
                 chat_type = "👤 Личный"
                 participants_count = "-"
-            elif dialog.is_group:
-                chat_type = "👥 Группа"
-                # Для групп получаем информацию через GroupManager (с анти-спам защитой)
-                try:
-                    group_info = await manager.get_group_info(dialog.id)
-                    participants_count = str(group_info.get('participants_count', '?')) if group_info else "?"
-                    if group_info:
-                        groups_data.append({
-                            'id': dialog.id,
-                            'title': dialog.title,
-                            'participants_count': group_info.get('participants_count', 0),
-                            'type': 'group'
-                        })
-                except Exception as e:
-                    logger.warning(f"Не удалось получить информацию о группе {dialog.id}: {e}")
-                    participants_count = "?"
-            elif dialog.is_channel:
-                chat_type = "📢 Канал"
-                # Для каналов также получаем информацию через GroupManager
-                try:
-                    channel_info = await manager.get_group_info(dialog.id)
-                    participants_count = str(channel_info.get('participants_count', '?')) if channel_info else "?"
-                    if channel_info:
-                        groups_data.append({
-                            'id': dialog.id,
-                            'title': dialog.title,
-                            'participants_count': channel_info.get('participants_count', 0),
-                            'type': 'channel'
-                        })
-                except Exception as e:
-                    logger.warning(f"Не удалось получить информацию о канале {dialog.id}: {e}")
-                    participants_count = "?"
+            elif dialog.is_group or dialog.is_channel:
+                kind = 'group' if dialog.is_group else 'channel'
+                chat_type = "👥 Группа" if kind == 'group' else "📢 Канал"
+                group_info = info_by_id.get(dialog.id)
+                if isinstance(group_info, BaseException):
+                    what = "группе" if kind == 'group' else "канале"
+                    logger.warning(f"Не удалось получить информацию о {what} {dialog.id}: {group_info}")
+                    group_info = None
+                participants_count = str(group_info.get('participants_count', '?')) if group_info else "?"
+                if group_info:
+                    groups_data.append({
+                        'id': dialog.id,
+                        'title': dialog.title,
+                        'participants_count': group_info.get('participants_count', 0),
+                        'type': kind
+                    })
             else:
                 chat_type = "❓ Другой"
                 participants_count = "-"
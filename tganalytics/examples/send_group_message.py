@@ -19,9 +19,11 @@ from pathlib import Path
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 PKG_DIR = PROJECT_ROOT / "packages"
 TG_CORE_DIR = PKG_DIR / "tg_core"
+_sys_path = set(sys.path)
 for p in (str(PKG_DIR), str(TG_CORE_DIR)):
-    if p not in sys.path:
+    if p not in _sys_path:
         sys.path.insert(0, p)
+        _sys_path.add(p)
 
 from tganalytics.infra.tele_client import get_client
 from tganalytics.domain.groups import GroupManager
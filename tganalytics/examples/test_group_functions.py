@@ -8,6 +8,11 @@ import json
 from tganalytics.infra.tele_client import get_client
 from tganalytics.domain.groups import GroupManager
 
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None
+
 async def test_group_functions():
     """Тестирует основные функции работы с группами"""
     
@@ -76,8 +81,11 @@ async def test_group_functions():
             from pathlib import Path
             Path(export_file).parent.mkdir(parents=True, exist_ok=True)
             
-            with open(export_file, 'w', encoding='utf-8') as f:
-                json.dump(participants_for_export, f, ensure_ascii=False, indent=2)
+            if orjson is not None:
+                payload = orjson.dumps(participants_for_export, option=orjson.OPT_INDENT_2)
+            else:
+                payload = json.dumps(participants_for_export, ensure_ascii=False, indent=2).encode('utf-8')
+            Path(export_file).write_bytes(payload)
             print(f"   ✅ Экспортировано {len(participants_for_export)} участников в {export_file}")
         else:
             print("   ❌ Нет данных для экспорта")
@@ -4,36 +4,45 @@ from __future__ import annotations
 
 import secrets
 import time
+from collections import Counter
+from functools import lru_cache
 from typing import Any, Callable
 
 from mcp_actions_policy import hash_payload, normalize_target
 
 
+@lru_cache(maxsize=4096)
+def _hash_add_member(target: str, user: str) -> str:
+    """Memoized add_member fingerprint; re-submitted batches reuse the digest."""
+    return hash_payload({"action": "add_member", "target": target, "user": user})
+
+
+_STATUS_TO_COUNT = {
+    "pending": "pending_count",
+    "success": "success_count",
+    "already_member": "already_member_count",
+    "blocked_rights": "blocked_rights_count",
+    "blocked_policy": "blocked_policy_count",
+}
+# summary key order is part of the output shape
+_COUNT_KEYS = (
+    "pending_count",
+    "success_count",
+    "already_member_count",
+    "failed_count",
+    "blocked_rights_count",
+    "blocked_policy_count",
+)
+
+
 def summarize_batch(batch: dict[str, Any]) -> dict[str, Any]:
     """Build compact progress summary for batch state."""
     actions = batch.get("actions", [])
-    counts = {
-        "pending_count": 0,
-        "success_count": 0,
-        "already_member_count": 0,
-        "failed_count": 0,
-        "blocked_rights_count": 0,
-        "blocked_policy_count": 0,
-    }
-    for action in actions:
-        status = str(action.get("status", "pending"))
-        if status == "pending":
-            counts["pending_count"] += 1
-        elif status == "success":
-            counts["success_count"] += 1
-        elif status == "already_member":
-            counts["already_member_count"] += 1
-        elif status == "blocked_rights":
-            counts["blocked_rights_count"] += 1
-        elif status == "blocked_policy":
-            counts["blocked_policy_count"] += 1
-        else:
-            counts["failed_count"] += 1
+    by_status = Counter(str(action.get("status", "pending")) for action in actions)
+    counts = dict.fromkeys(_COUNT_KEYS, 0)
+    # one dispatch per distinct status; anything unknown counts as failed
+    for status, n in by_status.items():
+        counts[_STATUS_TO_COUNT.get(status, "failed_count")] += n
 
     return {
         "batch_id": batch.get("id"),
@@ -62,14 +71,8 @@ def create_add_member_batch_record(
 ) -> tuple[dict[str, Any], list[dict[str, str]]]:
     """Create canonical batch record for add-member workflow."""
     normalized_user = str(user).strip()
-    unique_groups: list[str] = []
-    seen = set()
-    for group in groups:
-        g = str(group).strip()
-        if not g or g in seen:
-            continue
-        seen.add(g)
-        unique_groups.append(g)
+    # order-preserving dedup of stripped, non-empty group ids
+    unique_groups = list(dict.fromkeys(g for g in (str(x).strip() for x in groups) if g))
 
     blocked_targets: list[dict[str, str]] = []
     actions: list[dict[str, Any]] = []
@@ -77,13 +80,7 @@ def create_add_member_batch_record(
 
     for group in unique_groups:
         allowed, error = check_target_allowed(group)
-        action_hash = hash_payload(
-            {
-                "action": "add_member",
-                "target": normalize_target(group),
-                "user": user_key,
-            }
-        )
+        action_hash = _hash_add_member(normalize_target(group), user_key)
         if not allowed:
             blocked_targets.append({"group": group, "error": error or "blocked"})
             actions.append(
@@ -111,6 +108,7 @@ def create_add_member_batch_record(
 
     now = int(time.time())
     hours = max(1, int(ttl_hours))
+    # one getrandom per batch; negligible next to the locked state-file write that persists it
     batch_id = f"batch_{secrets.token_urlsafe(7)}"
     batch = {
         "id": batch_id,
@@ -4,30 +4,77 @@ from __future__ import annotations
 
 import hashlib
 import json
+from functools import lru_cache
 from typing import Any, Mapping
 
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None
 
+
+@lru_cache(maxsize=2048)
 def normalize_target(group: str) -> str:
-    """Normalize group identifier for allowlist checks."""
-    value = str(group).strip()
-    if value.startswith("@"):
-        value = value[1:]
-    return value.lower()
+    """Normalize group identifier for allowlist checks.
+
+    Pure and called per group on every action/allowlist check; the set of
+    identifiers is small, so results are memoized.
+    """
+    return str(group).strip().removeprefix("@").lower()
+
+
+def parse_allowlist(raw: str) -> frozenset[str]:
+    """Parse comma-separated target identifiers into normalized frozenset.
+
+    Parsed once at server startup; per-action checks are a single membership test.
+    """
+    return frozenset(normalize_target(item) for item in raw.split(",") if item.strip())
+
+
+_ACTION_TARGET_USER_KEYS = frozenset(("action", "target", "user"))
 
+# Scalars orjson encodes byte-identically to the sorted/compact json.dumps form
+# (floats are excluded: their repr differs between the two encoders).
+_ORJSON_SAFE_TYPES = frozenset((str, int, bool, type(None)))
 
-def parse_allowlist(raw: str) -> set[str]:
-    """Parse comma-separated target identifiers into normalized set."""
-    values = set()
-    for chunk in raw.split(","):
-        item = chunk.strip()
-        if item:
-            values.add(normalize_target(item))
-    return values
+
+def _canonical_action_target_user(action: str, target: str, user: str) -> bytes:
+    """Canonical bytes for the common {action, target, user} payload.
+
+    Byte-identical to the generic sorted/compact json.dumps encoding, so
+    digests do not change; only the string values go through the encoder.
+    """
+    return (
+        '{"action":' + json.dumps(action, ensure_ascii=False)
+        + ',"target":' + json.dumps(target, ensure_ascii=False)
+        + ',"user":' + json.dumps(user, ensure_ascii=False) + "}"
+    ).encode("utf-8")
+
+
+def _canonical_json(payload: dict[str, Any]) -> bytes:
+    """Sorted compact UTF-8 JSON; orjson for flat scalar payloads, stdlib otherwise."""
+    if orjson is not None and all(
+        type(k) is str and type(v) in _ORJSON_SAFE_TYPES for k, v in payload.items()
+    ):
+        try:
+            return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            # e.g. ints past 64 bits or lone surrogates: let the stdlib path decide
+            pass
+    return json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
 
 def hash_payload(payload: dict[str, Any]) -> str:
-    """Stable hash for action payload."""
-    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    """Stable hash for action payload.
+
+    Fingerprint only (dedup/approval binding), not an adversarial MAC. The hex
+    digest is persisted in approval, idempotency and batch state files, so the
+    algorithm (sha256) and encoding must not change without a state migration.
+    """
+    if payload.keys() == _ACTION_TARGET_USER_KEYS and all(type(v) is str for v in payload.values()):
+        encoded = _canonical_action_target_user(payload["action"], payload["target"], payload["user"])
+    else:
+        encoded = _canonical_json(payload)
     return hashlib.sha256(encoded).hexdigest()
 
 
@@ -60,6 +107,12 @@ def detect_unsafe_defaults(
     return issues
 
 
+@lru_cache(maxsize=16)
+def _fold_phrase(phrase: str) -> str:
+    """Casefold the configured phrase once; it is effectively a server constant."""
+    return phrase.casefold()
+
+
 def validate_confirmation_text(
     *,
     confirmation_text: str,
@@ -79,7 +132,7 @@ def validate_confirmation_text(
             "Execution blocked: add confirmation_text from user in this thread "
             f"(min {min_confirmation_text_len} chars).",
         )
-    if confirmation_phrase and text.lower() != confirmation_phrase:
+    if confirmation_phrase and text.casefold() != _fold_phrase(confirmation_phrase):
         return (
             False,
             f"Execution blocked: confirmation_text must be exactly '{confirmation_phrase}'.",
@@ -1,31 +1,83 @@
-"""State file helpers for Action MCP with optional cross-process locks."""
+"""State file helpers for Action MCP with optional cross-process locks.
+
+Two storage shapes are supported:
+- plain JSON dict rewritten atomically on every update (`load_json_dict`/`update_json_dict`);
+- JSON snapshot plus append-only JSONL mutation log (`*_json_log` helpers), where each
+  write appends one `{"ts", "key", "patch"}` line and the log is folded into the snapshot
+  once it grows past a size threshold.
+"""
 
 from __future__ import annotations
 
 import json
 import os
+import threading
+import time
 from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Callable, Iterator, TypeVar
+from typing import Any, Callable, Iterable, Iterator, TypeVar
 
 try:
     import fcntl
 except Exception:  # pragma: no cover
     fcntl = None
 
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None
+
 T = TypeVar("T")
 
+DEFAULT_LOG_COMPACT_BYTES = 256 * 1024
+
+# "process" (default): flock on a sibling .lock file, safe across processes
+# sharing the state files (e.g. parallel batch workers).
+# "local": in-process lock only, for a single server process owning its files.
+STATE_LOCK_MODE = os.environ.get("TG_STATE_LOCK_MODE", "process").strip().lower()
+_LOCAL_LOCKS: dict[str, threading.RLock] = {}
+
+# "relaxed" (default): rely on atomic replace only; "sync": fdatasync the tmp
+# file before replacing and fsync the state dir after the rename / a log create,
+# so a power loss can't lose the rename or leave an empty snapshot behind.
+STATE_DURABILITY = os.environ.get("TG_STATE_DURABILITY", "relaxed").strip().lower()
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
+# str(path) -> ((st_ino, st_mtime_ns, st_size), parsed dict). Files are only ever
+# replaced atomically, so an unchanged stat key means unchanged content, and hits
+# skip the shared lock. That holds on filesystems with ns mtimes (ext4, xfs, btrfs,
+# tmpfs). With coarse mtimes and inode reuse (ext3, NFS, some container overlays) a
+# same-size replace can look unchanged: set TG_STATE_STAT_CACHE=0 there to always
+# re-read under the lock.
+STATE_STAT_CACHE = os.environ.get("TG_STATE_STAT_CACHE", "1").strip() != "0"
+_STATE_CACHE: dict[str, tuple[tuple[int, int, int], dict[str, Any]]] = {}
+
+# (str(path), root_key) -> (snapshot stat key, log inode, log bytes replayed, state).
+# The log is only appended to while its snapshot stays put (truncation always comes
+# with a snapshot replace), so readers replay just the bytes past the remembered
+# offset. Same TG_STATE_STAT_CACHE switch and caveat as above.
+_LOG_CACHE: dict[
+    tuple[str, str | None],
+    tuple[tuple[int, int, int] | None, int | None, int, dict[str, Any]],
+] = {}
+_LOG_CACHE_LOCK = threading.Lock()
+
 
 def load_json_dict(path: Path, *, root_key: str | None = None) -> dict[str, Any]:
-    """Load dict-like JSON payload from path, returning empty dict on errors."""
-    if not path.exists():
+    """Load dict-like JSON payload from path, returning empty dict on errors.
+
+    Unchanged files are served from an in-process cache (a fresh copy per
+    call) without taking the lock or re-parsing.
+    """
+    key = _stat_key(path)
+    if key is None:
         return {}
-    with _file_lock(path, shared=True):
-        raw = _read_json_dict(path)
-        if root_key is None:
-            return raw
-        nested = raw.get(root_key, {})
-        return nested if isinstance(nested, dict) else {}
+    raw = _cached_json_dict(path, key)
+    if raw is None:
+        with _file_lock(path, shared=True):
+            raw, _ = _read_json_dict(path)
+    return _split_root(raw, root_key)
 
 
 def update_json_dict(
@@ -36,12 +88,8 @@ def update_json_dict(
 ) -> T:
     """Atomically load-mutate-save dict payload under file lock."""
     with _file_lock(path, shared=False):
-        raw = _read_json_dict(path)
-        if root_key is None:
-            state = raw
-        else:
-            nested = raw.get(root_key, {})
-            state = nested if isinstance(nested, dict) else {}
+        raw, key = _read_json_dict(path)
+        state = _split_root(raw, root_key)
 
         result = mutator(state)
 
@@ -51,42 +99,405 @@ def update_json_dict(
             raw[root_key] = state
             payload = raw
 
-        _atomic_write_json(path, payload)
+        # read-only mutations (e.g. a duplicate check with nothing to trim) skip the rewrite
+        if not _matches_disk(path, key, payload):
+            _atomic_write_json(path, payload)
+        return result
+
+
+def load_json_log(path: Path, *, root_key: str | None = None) -> dict[str, Any]:
+    """Load snapshot dict from path and replay sibling mutation log on top of it.
+
+    Log lines replayed by an earlier call in this process are not parsed again.
+    """
+    log_path = _log_path(path)
+    if not path.exists() and not log_path.exists():
+        return {}
+    with _file_lock(path, shared=True):
+        if not STATE_STAT_CACHE:
+            return _read_snapshot_with_log(path, root_key=root_key)[1]
+        with _LOG_CACHE_LOCK:
+            return _copy_json(_cached_log_state(path, root_key))
+
+
+def load_json_log_entry(path: Path, key: str, *, root_key: str | None = None) -> Any:
+    """Single entry of `load_json_log(path)` (or None) without copying the whole state."""
+    log_path = _log_path(path)
+    if not path.exists() and not log_path.exists():
+        return None
+    with _file_lock(path, shared=True):
+        if not STATE_STAT_CACHE:
+            return _read_snapshot_with_log(path, root_key=root_key)[1].get(key)
+        with _LOG_CACHE_LOCK:
+            return _copy_json(_cached_log_state(path, root_key).get(key))
+
+
+def append_json_log(
+    path: Path,
+    key: str,
+    patch: dict[str, Any],
+    *,
+    root_key: str | None = None,
+    compact_bytes: int = DEFAULT_LOG_COMPACT_BYTES,
+) -> None:
+    """Append one shallow-merge patch for `key` without rewriting the snapshot."""
+    with _file_lock(path, shared=False):
+        _append_log_records(path, {key: patch}, compact_bytes=compact_bytes, root_key=root_key)
+
+
+def update_json_log(
+    path: Path,
+    mutator: Callable[[dict[str, Any]], tuple[dict[str, dict[str, Any]], T]],
+    *,
+    root_key: str | None = None,
+    compact_bytes: int = DEFAULT_LOG_COMPACT_BYTES,
+) -> T:
+    """Load snapshot+log under lock and append patches returned by mutator.
+
+    Mutator receives the current state and returns `(patches, result)`, where
+    `patches` maps state keys to shallow-merge dicts. Empty patches write nothing.
+    """
+    with _file_lock(path, shared=False):
+        _, state = _read_snapshot_with_log(path, root_key=root_key)
+        patches, result = mutator(state)
+        if patches:
+            _append_log_records(path, patches, compact_bytes=compact_bytes, root_key=root_key)
         return result
 
 
+def write_json_log_snapshot(
+    path: Path,
+    state: dict[str, Any],
+    *,
+    root_key: str | None = None,
+) -> None:
+    """Replace snapshot with state and truncate mutation log."""
+    with _file_lock(path, shared=False):
+        raw, _ = _read_json_dict(path)
+        if root_key is None:
+            payload = state
+        else:
+            raw[root_key] = state
+            payload = raw
+        _atomic_write_json(path, payload)
+        _truncate_log(path)
+
+
+def prune_json_log(
+    path: Path,
+    keep: Callable[[str, Any], bool],
+    *,
+    root_key: str | None = None,
+) -> int:
+    """Fold log into snapshot keeping only entries where `keep(key, value)`; return kept count."""
+    with _file_lock(path, shared=False):
+        raw, state = _read_snapshot_with_log(path, root_key=root_key)
+        kept = {key: value for key, value in state.items() if keep(key, value)}
+        if root_key is None:
+            raw = kept
+        else:
+            raw[root_key] = kept
+        _atomic_write_json(path, raw)
+        _truncate_log(path)
+        return len(kept)
+
+
+def _split_root(raw: dict[str, Any], root_key: str | None) -> dict[str, Any]:
+    """State dict under root_key (or raw itself); non-dict/missing nested -> fresh {}."""
+    if root_key is None:
+        return raw
+    nested = raw.get(root_key)
+    # parsed JSON objects are exactly dict: skip the isinstance MRO walk
+    return nested if type(nested) is dict else {}
+
+
 @contextmanager
 def _file_lock(path: Path, *, shared: bool) -> Iterator[None]:
-    """Best-effort process lock using a sibling .lock file."""
-    path.parent.mkdir(parents=True, exist_ok=True)
-    lock_path = path.with_suffix(path.suffix + ".lock")
-    fd = os.open(str(lock_path), os.O_CREAT | os.O_RDWR, 0o600)
+    """Best-effort process lock using a sibling .lock file.
+
+    Falls back to a per-path in-process lock in "local" mode or where flock
+    is unavailable (no lock file is touched then).
+    """
+    if STATE_LOCK_MODE == "local" or fcntl is None:
+        with _LOCAL_LOCKS.setdefault(str(path), threading.RLock()):
+            yield
+        return
+
+    lock_path = _aux_paths(path)[0]
+    fd = _open_in_dir(lock_path, os.O_CREAT | os.O_RDWR, 0o600)
     try:
-        if fcntl is not None:
-            mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
-            fcntl.flock(fd, mode)
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
         yield
     finally:
         try:
-            if fcntl is not None:
-                fcntl.flock(fd, fcntl.LOCK_UN)
+            fcntl.flock(fd, fcntl.LOCK_UN)
         except Exception:
             pass
         os.close(fd)
 
 
-def _read_json_dict(path: Path) -> dict[str, Any]:
-    if not path.exists():
-        return {}
+def _stat_key(path: Path) -> tuple[int, int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _copy_json(value: Any) -> Any:
+    """Copy a parsed JSON tree (dicts/lists only; leaves are immutable)."""
+    if isinstance(value, dict):
+        return {k: _copy_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(v) for v in value]
+    return value
+
+
+def _cached_json_dict(path: Path, key: tuple[int, int, int]) -> dict[str, Any] | None:
+    if not STATE_STAT_CACHE:
+        return None
+    entry = _STATE_CACHE.get(str(path))
+    if entry is None or entry[0] != key:
+        return None
+    return _copy_json(entry[1])
+
+
+def _matches_disk(path: Path, key: tuple[int, int, int] | None, payload: dict[str, Any]) -> bool:
+    """True when payload equals the parse of the file read under this same lock.
+
+    `key` is the stat key returned by that read: an entry left over from an
+    earlier read of a since-replaced file is never trusted.
+    """
+    if not STATE_STAT_CACHE or key is None:
+        return False
+    entry = _STATE_CACHE.get(str(path))
+    return entry is not None and entry[0] == key and entry[1] == payload
+
+
+def _read_json_dict(path: Path) -> tuple[dict[str, Any], tuple[int, int, int] | None]:
+    """Return (parsed dict, stat key of the cached parse or None if nothing was cached)."""
+    # no exists() pre-check: a missing file is just another read error -> {}
+    key = _stat_key(path)
+    if key is not None:
+        if key[2] == 0:
+            # freshly touched/truncated file: nothing to open or parse
+            _STATE_CACHE.pop(str(path), None)
+            return {}, None
+        cached = _cached_json_dict(path, key)
+        if cached is not None:
+            return cached, key
     try:
-        raw = json.loads(path.read_text(encoding="utf-8"))
-        return raw if isinstance(raw, dict) else {}
+        raw = _json_loads(path.read_bytes())
     except Exception:
-        return {}
+        _STATE_CACHE.pop(str(path), None)
+        return {}, None
+    if not isinstance(raw, dict):
+        # valid JSON but not an object: the old entry no longer describes the file
+        _STATE_CACHE.pop(str(path), None)
+        return {}, None
+    if key is None:
+        return raw, None
+    # stat taken before the read: a concurrent replace only costs a later miss
+    _STATE_CACHE[str(path)] = (key, _copy_json(raw))
+    return raw, key
+
+
+def _open_in_dir(path: Path, flags: int, mode: int) -> int:
+    """os.open that creates the parent dir only when it turns out to be missing.
+
+    Saves a mkdir syscall on every access once the state dir exists.
+    """
+    try:
+        return os.open(str(path), flags, mode)
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return os.open(str(path), flags, mode)
 
 
 def _atomic_write_json(path: Path, payload: dict[str, Any]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    tmp.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    tmp = _aux_paths(path)[1]
+    data = _json_dumps(payload)
+    # rename keeps inode/mtime/size, so the tmp stat is the stat of the new file
+    sync = STATE_DURABILITY == "sync"
+    key = _write_bytes_fd(tmp, data, sync=sync)
     os.replace(tmp, path)
+    if sync:
+        # the rename lives in the directory entry, not in the file
+        _fsync_dir(path.parent)
+    # cache what was written (re-parsed: stdlib fallback may coerce non-str keys)
+    _STATE_CACHE[str(path)] = (key, _json_loads(data))
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(str(path), os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    except OSError:  # pragma: no cover - platforms without directory fds
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_bytes_fd(
+    path: Path,
+    data: bytes,
+    *,
+    sync: bool,
+    flags: int = os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+    mode: int = 0o600,
+) -> tuple[int, int, int]:
+    """Write bytes via a raw fd (no buffered file object); return the stat key."""
+    fd = _open_in_dir(path, flags, mode)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        if sync:
+            _fdatasync(fd)
+        st = os.fstat(fd)
+    finally:
+        os.close(fd)
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("utf-8"))
+
+
+def _json_dumps(payload: Any) -> bytes:
+    """Compact UTF-8 JSON (non-ASCII kept as-is), via orjson when installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload)
+        except TypeError:
+            # orjson rejects non-str dict keys; stdlib coerces them.
+            pass
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+@lru_cache(maxsize=64)
+def _aux_paths(path: Path) -> tuple[Path, Path, Path]:
+    """Sibling (.lock, .tmp, .log) paths; a server touches a handful of state files."""
+    return tuple(path.with_suffix(path.suffix + ext) for ext in (".lock", ".tmp", ".log"))
+
+
+def _log_path(path: Path) -> Path:
+    return _aux_paths(path)[2]
+
+
+def _read_snapshot_with_log(
+    path: Path,
+    *,
+    root_key: str | None,
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Return (raw snapshot payload, state with log replayed). Caller holds the lock."""
+    raw, _ = _read_json_dict(path)
+    state = _split_root(raw, root_key)
+    if root_key is not None:
+        raw[root_key] = state
+
+    log_path = _log_path(path)
+    if not log_path.exists():
+        return raw, state
+    try:
+        with open(log_path, "rb") as f:
+            _replay_log_lines(state, f)
+    except Exception:
+        pass
+    return raw, state
+
+
+def _replay_log_lines(state: dict[str, Any], lines: Iterable[bytes]) -> None:
+    for line in lines:
+        try:
+            record = _json_loads(line)
+        except Exception:
+            # Torn tail line after a crash: everything before it is still valid.
+            continue
+        if not isinstance(record, dict):
+            continue
+        key = record.get("key")
+        patch = record.get("patch")
+        if not isinstance(key, str) or not isinstance(patch, dict):
+            continue
+        current = state.get(key)
+        if not isinstance(current, dict):
+            current = {}
+            state[key] = current
+        current.update(patch)
+
+
+def _cached_log_state(path: Path, root_key: str | None) -> dict[str, Any]:
+    """Replayed snapshot+log state, parsing only log bytes appended since the last call.
+
+    Caller holds the file lock and _LOG_CACHE_LOCK; the result is shared, copy before use.
+    """
+    cache_key = (str(path), root_key)
+    snap_key = _stat_key(path)
+    log_key = _stat_key(_log_path(path))
+    log_ino = log_key[0] if log_key is not None else None
+    log_size = log_key[2] if log_key is not None else 0
+
+    entry = _LOG_CACHE.get(cache_key)
+    if entry is not None and entry[0] == snap_key and entry[1] == log_ino and entry[2] <= log_size:
+        _, _, offset, state = entry
+    else:
+        raw, _ = _read_json_dict(path)
+        offset, state = 0, _split_root(raw, root_key)
+
+    if log_size > offset:
+        try:
+            with open(_log_path(path), "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            data = b""
+        # only whole lines: a torn tail is re-read once it is complete (or compacted away)
+        end = data.rfind(b"\n") + 1
+        _replay_log_lines(state, data[:end].splitlines())
+        offset += end
+
+    _LOG_CACHE[cache_key] = (snap_key, log_ino, offset, state)
+    return state
+
+
+def _append_log_records(
+    path: Path,
+    patches: dict[str, dict[str, Any]],
+    *,
+    compact_bytes: int,
+    root_key: str | None = None,
+) -> None:
+    """Append patches as JSONL and compact into snapshot past threshold. Caller holds the lock."""
+    log_path = _log_path(path)
+    now = time.time()
+    lines = b"".join(
+        _json_dumps({"ts": now, "key": key, "patch": patch}) + b"\n" for key, patch in patches.items()
+    )
+    sync = STATE_DURABILITY == "sync"
+    # O_APPEND raw fd: the batch lands at the end in one write, size comes from fstat
+    _, _, size = _write_bytes_fd(
+        log_path,
+        lines,
+        sync=sync,
+        flags=os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+        mode=0o600,
+    )
+    if sync and size == len(lines):
+        # log was just created (or was empty): persist its directory entry too
+        _fsync_dir(log_path.parent)
+
+    if compact_bytes > 0 and size >= compact_bytes:
+        raw, _ = _read_snapshot_with_log(path, root_key=root_key)
+        _atomic_write_json(path, raw)
+        _truncate_log(path)
+
+
+def _truncate_log(path: Path) -> None:
+    log_path = _log_path(path)
+    if log_path.exists():
+        with open(log_path, "w", encoding="utf-8"):
+            pass
@@ -5,15 +5,23 @@ Contains high-risk Telegram operations behind explicit env gates.
 
 from __future__ import annotations
 
+import asyncio
 import json
 import os
 import secrets
+import stat
 import time
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None
+
 load_dotenv()
 
 # Hard default: direct telethon writes are blocked unless context is actions_mcp.
@@ -34,7 +42,16 @@ from mcp_actions_policy import (
     parse_allowlist,
     validate_confirmation_text,
 )
-from mcp_actions_state import load_json_dict, update_json_dict
+from mcp_actions_state import (
+    append_json_log,
+    load_json_dict,
+    load_json_log,
+    load_json_log_entry,
+    prune_json_log,
+    update_json_dict,
+    update_json_log,
+    write_json_log_snapshot,
+)
 from mcp_server_common import MCPServerContext
 from tganalytics.infra.limiter import get_rate_limiter
 from tganalytics.infra.metrics import snapshot
@@ -66,13 +83,24 @@ except ValueError:
     IDEMPOTENCY_WINDOW_SEC = 24 * 3600
 
 REQUIRE_CONFIRMATION_TEXT = os.environ.get("TG_ACTIONS_REQUIRE_CONFIRMATION_TEXT", "1") == "1"
-CONFIRMATION_PHRASE = os.environ.get("TG_ACTIONS_CONFIRMATION_PHRASE", "отправляй").strip().lower()
+CONFIRMATION_PHRASE = os.environ.get("TG_ACTIONS_CONFIRMATION_PHRASE", "отправляй").strip().casefold()
 REQUIRE_APPROVAL_CODE = os.environ.get("TG_ACTIONS_REQUIRE_APPROVAL_CODE", "1") == "1"
 IDEMPOTENCY_ENABLED = os.environ.get("TG_ACTIONS_IDEMPOTENCY_ENABLED", "1") == "1"
 IDEMPOTENCY_FILE = Path(
     os.environ.get("TG_ACTIONS_IDEMPOTENCY_FILE", "data/anti_spam/action_idempotency.json")
 )
 
+try:
+    IDEMPOTENCY_LOG_COMPACT_BYTES = int(
+        os.environ.get("TG_ACTIONS_IDEMPOTENCY_LOG_COMPACT_BYTES", str(256 * 1024))
+    )
+except ValueError:
+    IDEMPOTENCY_LOG_COMPACT_BYTES = 256 * 1024
+
+# stale hashes are purged once the stored map exceeds 2x the last known live set
+IDEMPOTENCY_PURGE_MIN_KEYS = 256
+_idempotency_live_keys = 0
+
 try:
     APPROVAL_TTL_SEC = int(os.environ.get("TG_ACTIONS_APPROVAL_TTL_SEC", "1800"))
 except ValueError:
@@ -102,6 +130,11 @@ except ValueError:
 
 BATCH_FILE = Path(os.environ.get("TG_ACTIONS_BATCH_FILE", "data/anti_spam/action_batches.json"))
 
+try:
+    BATCH_LOG_COMPACT_BYTES = int(os.environ.get("TG_ACTIONS_BATCH_LOG_COMPACT_BYTES", str(256 * 1024)))
+except ValueError:
+    BATCH_LOG_COMPACT_BYTES = 256 * 1024
+
 
 def _detect_unsafe_defaults() -> list[str]:
     """Return list of unsafe policy settings."""
@@ -129,26 +162,39 @@ def _normalize_target(group: str) -> str:
     return normalize_target(group)
 
 
-def _parse_allowlist(raw: str) -> set[str]:
+def _parse_allowlist(raw: str) -> frozenset[str]:
     return parse_allowlist(raw)
 
 
-ALLOWED_TARGETS = _parse_allowlist(os.environ.get("TG_ACTIONS_ALLOWED_GROUPS", ""))
+ALLOWED_TARGETS: frozenset[str] = _parse_allowlist(os.environ.get("TG_ACTIONS_ALLOWED_GROUPS", ""))
 
 mcp = FastMCP(SERVER_NAME)
 ctx = MCPServerContext(allow_session_switch=ALLOW_SESSION_SWITCH)
 
 
 def _check_target_allowed(group: str) -> tuple[bool, str | None]:
+    targets = ALLOWED_TARGETS
+    if type(targets) is not frozenset:
+        targets = frozenset(targets)
+    return _target_check_cached(group, REQUIRE_ALLOWLIST, targets)
+
+
+@lru_cache(maxsize=1024)
+def _target_check_cached(
+    group: str,
+    require_allowlist: bool,
+    allowed_targets: frozenset[str],
+) -> tuple[bool, str | None]:
+    """Allowlist verdict per target; the policy is part of the key, so edits never hit stale entries."""
     normalized = _normalize_target(group)
 
-    if REQUIRE_ALLOWLIST and not ALLOWED_TARGETS:
+    if require_allowlist and not allowed_targets:
         return (
             False,
             "Actions blocked: TG_ACTIONS_REQUIRE_ALLOWLIST=1 but TG_ACTIONS_ALLOWED_GROUPS is empty.",
         )
 
-    if ALLOWED_TARGETS and normalized not in ALLOWED_TARGETS:
+    if allowed_targets and normalized not in allowed_targets:
         return (
             False,
             f"Target '{group}' is not in TG_ACTIONS_ALLOWED_GROUPS.",
@@ -187,31 +233,45 @@ def _check_action_preconditions(
     return True, None
 
 
+# (needle in lowercased error, suggestion) in priority order; "{phrase}" is
+# filled with CONFIRMATION_PHRASE at call time.
+_NEXT_STEP_RULES: tuple[tuple[str, str], ...] = (
+    (
+        "unsafe actionmcp policy detected",
+        "Restore strict safety env flags, then restart ActionMCP. "
+        "Use TG_ACTIONS_UNSAFE_OVERRIDE=1 only for temporary debugging.",
+    ),
+    ("actions are disabled", "Set TG_ACTIONS_ENABLED=1 for ActionMCP and restart server."),
+    (
+        "require_allowlist=1 but tg_actions_allowed_groups is empty",
+        "Set TG_ACTIONS_ALLOWED_GROUPS with explicit targets, then retry dry_run.",
+    ),
+    ("is not in tg_actions_allowed_groups", "Add this target to TG_ACTIONS_ALLOWED_GROUPS, then retry dry_run."),
+    ("confirm=true", "Run same action with dry_run=true first, then rerun with confirm=true."),
+    ("confirmation_text", "Use exact confirmation_text='{phrase}' in this thread."),
+    (
+        "too fresh right after dry_run",
+        "Wait until approval min age passes, then execute with the same approval_code.",
+    ),
+    (
+        "approval_code",
+        "Run matching action with dry_run=true to get one-time approval_code, then execute.",
+    ),
+    (
+        "duplicate action blocked",
+        "Wait until idempotency window expires or set force_resend=true if resend is intentional.",
+    ),
+)
+
+
 def _suggest_next_step(error: str | None) -> str | None:
     text = str(error or "").lower()
     if not text:
         return None
-    if "unsafe actionmcp policy detected" in text:
-        return (
-            "Restore strict safety env flags, then restart ActionMCP. "
-            "Use TG_ACTIONS_UNSAFE_OVERRIDE=1 only for temporary debugging."
-        )
-    if "actions are disabled" in text:
-        return "Set TG_ACTIONS_ENABLED=1 for ActionMCP and restart server."
-    if "require_allowlist=1 but tg_actions_allowed_groups is empty" in text:
-        return "Set TG_ACTIONS_ALLOWED_GROUPS with explicit targets, then retry dry_run."
-    if "is not in tg_actions_allowed_groups" in text:
-        return "Add this target to TG_ACTIONS_ALLOWED_GROUPS, then retry dry_run."
-    if "confirm=true" in text:
-        return "Run same action with dry_run=true first, then rerun with confirm=true."
-    if "confirmation_text" in text:
-        return f"Use exact confirmation_text='{CONFIRMATION_PHRASE}' in this thread."
-    if "too fresh right after dry_run" in text:
-        return "Wait until approval min age passes, then execute with the same approval_code."
-    if "approval_code" in text:
-        return "Run matching action with dry_run=true to get one-time approval_code, then execute."
-    if "duplicate action blocked" in text:
-        return "Wait until idempotency window expires or set force_resend=true if resend is intentional."
+    # ordered cascade: the first rule whose needle occurs wins
+    for needle, suggestion in _NEXT_STEP_RULES:
+        if needle in text:
+            return suggestion.format(phrase=CONFIRMATION_PHRASE)
     return None
 
 
@@ -228,32 +288,33 @@ def _hash_payload(payload: dict[str, Any]) -> str:
     return hash_payload(payload)
 
 
+def _idempotency_ts(value: Any) -> float | None:
+    """Timestamp of a stored entry: `{"ts": float}` from the log, bare float from old snapshots."""
+    if isinstance(value, dict):
+        value = value.get("ts")
+    try:
+        return float(value)
+    except Exception:
+        return None
+
+
 def _load_idempotency_state() -> dict[str, float]:
-    raw = load_json_dict(IDEMPOTENCY_FILE)
+    raw = load_json_log(IDEMPOTENCY_FILE)
     state: dict[str, float] = {}
     for key, value in raw.items():
-        if isinstance(key, str):
-            try:
-                state[key] = float(value)
-            except Exception:
-                continue
+        ts = _idempotency_ts(value)
+        if isinstance(key, str) and ts is not None:
+            state[key] = ts
     return state
 
 
 def _save_idempotency_state(state: dict[str, float]) -> None:
     normalized = {}
     for key, value in state.items():
-        if isinstance(key, str):
-            try:
-                normalized[key] = float(value)
-            except Exception:
-                continue
-
-    def _mut(current: dict[str, Any]) -> None:
-        current.clear()
-        current.update(normalized)
-
-    update_json_dict(IDEMPOTENCY_FILE, _mut)
+        ts = _idempotency_ts(value)
+        if isinstance(key, str) and ts is not None:
+            normalized[key] = {"ts": ts}
+    write_json_log_snapshot(IDEMPOTENCY_FILE, normalized)
 
 
 def _check_recent_duplicate(action_hash: str, now_ts: float | None = None) -> tuple[bool, int]:
@@ -261,40 +322,40 @@ def _check_recent_duplicate(action_hash: str, now_ts: float | None = None) -> tu
         return False, 0
     now = now_ts if now_ts is not None else time.time()
 
-    def _mut(state: dict[str, Any]) -> tuple[bool, int]:
-        normalized: dict[str, float] = {}
-        for key, value in state.items():
-            if not isinstance(key, str):
-                continue
-            try:
-                normalized[key] = float(value)
-            except Exception:
-                continue
-
-        # Trim stale keys while reading.
-        fresh = {k: v for k, v in normalized.items() if (now - v) <= IDEMPOTENCY_WINDOW_SEC}
-        state.clear()
-        state.update(fresh)
+    # read-only: stale keys are dropped by the purge in _mark_actions_executed
+    last_ts = _idempotency_ts(load_json_log_entry(IDEMPOTENCY_FILE, action_hash))
+    if last_ts is None or (now - last_ts) > IDEMPOTENCY_WINDOW_SEC:
+        return False, 0
 
-        last_ts = fresh.get(action_hash)
-        if last_ts is None:
-            return False, 0
+    retry_after = int(max(0, IDEMPOTENCY_WINDOW_SEC - (now - last_ts)))
+    return retry_after > 0, retry_after
 
-        retry_after = int(max(0, IDEMPOTENCY_WINDOW_SEC - (now - last_ts)))
-        return retry_after > 0, retry_after
 
-    return update_json_dict(IDEMPOTENCY_FILE, _mut)
+def _mark_action_executed(action_hash: str, now_ts: float | None = None) -> None:
+    _mark_actions_executed([action_hash], now_ts=now_ts)
 
 
-def _mark_action_executed(action_hash: str, now_ts: float | None = None) -> None:
-    if not IDEMPOTENCY_ENABLED:
+def _mark_actions_executed(action_hashes: list[str], now_ts: float | None = None) -> None:
+    """Append executed actions to the idempotency log; purge stale keys once they dominate."""
+    global _idempotency_live_keys
+    if not IDEMPOTENCY_ENABLED or not action_hashes:
         return
-    now = now_ts if now_ts is not None else time.time()
+    now = float(now_ts if now_ts is not None else time.time())
 
-    def _mut(state: dict[str, Any]) -> None:
-        state[action_hash] = float(now)
+    def _mut(state: dict[str, Any]) -> tuple[dict[str, dict[str, Any]], bool]:
+        patches = {action_hash: {"ts": now} for action_hash in action_hashes}
+        size = len(state) + sum(1 for action_hash in patches if action_hash not in state)
+        return patches, size > 2 * max(_idempotency_live_keys, IDEMPOTENCY_PURGE_MIN_KEYS)
+
+    needs_purge = update_json_log(IDEMPOTENCY_FILE, _mut, compact_bytes=IDEMPOTENCY_LOG_COMPACT_BYTES)
+    if needs_purge:
 
-    update_json_dict(IDEMPOTENCY_FILE, _mut)
+        def _keep(_key: str, value: Any) -> bool:
+            ts = _idempotency_ts(value)
+            return ts is not None and (now - ts) <= IDEMPOTENCY_WINDOW_SEC
+
+        # threshold tracks 2x the live set, so purge scans stay amortized O(1) per mark
+        _idempotency_live_keys = prune_json_log(IDEMPOTENCY_FILE, _keep)
 
 
 def _validate_confirmation_text(confirmation_text: str, dry_run: bool) -> tuple[bool, str | None]:
@@ -357,13 +418,31 @@ def _save_approvals_state(state: dict[str, dict[str, Any]]) -> None:
     update_json_dict(APPROVAL_FILE, _mut)
 
 
+def _approval_expires_at(item: Any) -> float:
+    if not isinstance(item, dict):
+        return 0.0
+    try:
+        return float(item.get("expires_at", 0))
+    except Exception:
+        return 0.0
+
+
 def _trim_approvals(state: dict[str, dict[str, Any]], now_ts: float | None = None) -> dict[str, dict[str, Any]]:
+    """Drop expired approvals in place and return state.
+
+    Codes are stored in issue order with a fixed TTL, so expiry is ordered too:
+    only the expired prefix is visited. Entries left behind after a TTL change
+    are still rejected by the expiry check in _consume_approval.
+    """
     now = now_ts if now_ts is not None else time.time()
-    return {
-        code: item
-        for code, item in state.items()
-        if isinstance(item, dict) and float(item.get("expires_at", 0)) > now
-    }
+    expired = []
+    for code, item in state.items():
+        if _approval_expires_at(item) > now:
+            break
+        expired.append(code)
+    for code in expired:
+        del state[code]
+    return state
 
 
 def _issue_approval(payload_hash: str, now_ts: float | None = None) -> dict[str, Any]:
@@ -373,14 +452,12 @@ def _issue_approval(payload_hash: str, now_ts: float | None = None) -> dict[str,
     execute_after = now + max(0, APPROVAL_MIN_AGE_SEC)
 
     def _mut(state: dict[str, Any]) -> None:
-        trimmed = _trim_approvals(state, now_ts=now)
-        trimmed[code] = {
+        _trim_approvals(state, now_ts=now)
+        state[code] = {
             "digest": payload_hash,
             "expires_at": expires_at,
             "issued_at": float(now),
         }
-        state.clear()
-        state.update(trimmed)
 
     update_json_dict(APPROVAL_FILE, _mut)
     return {
@@ -397,9 +474,7 @@ def _consume_approval(payload_hash: str, approval_code: str, now_ts: float | Non
     code = (approval_code or "").strip()
 
     def _mut(state: dict[str, Any]) -> tuple[bool, str | None]:
-        trimmed = _trim_approvals(state, now_ts=now)
-        state.clear()
-        state.update(trimmed)
+        _trim_approvals(state, now_ts=now)
 
         if not code:
             return (
@@ -408,7 +483,7 @@ def _consume_approval(payload_hash: str, approval_code: str, now_ts: float | Non
             )
 
         item = state.get(code)
-        if not item:
+        if not item or _approval_expires_at(item) <= now:
             return False, "Execution blocked: approval_code is invalid or expired."
         if item.get("digest") != payload_hash:
             return (
@@ -446,18 +521,37 @@ def _approval_gate(
 
 
 def _load_batches_state() -> dict[str, dict[str, Any]]:
-    batches = load_json_dict(BATCH_FILE, root_key="batches")
+    batches = load_json_log(BATCH_FILE, root_key="batches")
     return {str(k): v for k, v in batches.items() if isinstance(v, dict)}
 
 
 def _save_batches_state(state: dict[str, dict[str, Any]]) -> None:
+    """Rewrite full batch snapshot and clear mutation log."""
     normalized = {str(k): v for k, v in state.items() if isinstance(v, dict)}
+    write_json_log_snapshot(BATCH_FILE, normalized, root_key="batches")
 
-    def _mut(current: dict[str, Any]) -> None:
-        current.clear()
-        current.update(normalized)
 
-    update_json_dict(BATCH_FILE, _mut, root_key="batches")
+def _append_batch_mutation(batch_id: str, patch: dict[str, Any]) -> None:
+    """Persist changed batch fields as one log line instead of rewriting all batches."""
+    append_json_log(
+        BATCH_FILE,
+        str(batch_id),
+        patch,
+        root_key="batches",
+        compact_bytes=BATCH_LOG_COMPACT_BYTES,
+    )
+
+
+def _load_report(path: Path) -> Any:
+    """Parse a JSON report from raw bytes (orjson when installed)."""
+    data = path.read_bytes()
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # stdlib also takes NaN/Infinity literals: let it have the final say
+            pass
+    return json.loads(data.decode("utf-8"))
 
 
 def _get_batch(batch_id: str) -> tuple[dict[str, dict[str, Any]], dict[str, Any] | None]:
@@ -476,12 +570,12 @@ def _acquire_batch_run_lock(batch_id: str, now_ts: int | None = None) -> tuple[b
     bid = (batch_id or "").strip()
     blocked_error: str | None = None
 
-    def _mut(state: dict[str, Any]) -> None:
+    def _mut(state: dict[str, Any]) -> tuple[dict[str, dict[str, Any]], None]:
         nonlocal blocked_error
         batch = state.get(bid)
         if not isinstance(batch, dict):
             blocked_error = f"batch '{bid}' not found"
-            return
+            return {}, None
 
         locked_until = int(batch.get("run_lock_until_ts") or 0)
         locked_by = str(batch.get("run_lock_owner") or "")
@@ -490,13 +584,11 @@ def _acquire_batch_run_lock(batch_id: str, now_ts: int | None = None) -> tuple[b
                 f"batch is already running by another worker until {locked_until}; "
                 "retry later or after lock lease expires"
             )
-            return
+            return {}, None
 
-        batch["run_lock_owner"] = owner
-        batch["run_lock_until_ts"] = now + BATCH_RUN_LEASE_SEC
-        state[bid] = batch
+        return {bid: {"run_lock_owner": owner, "run_lock_until_ts": now + BATCH_RUN_LEASE_SEC}}, None
 
-    update_json_dict(BATCH_FILE, _mut, root_key="batches")
+    update_json_log(BATCH_FILE, _mut, root_key="batches", compact_bytes=BATCH_LOG_COMPACT_BYTES)
     if blocked_error:
         return False, blocked_error
     return True, None
@@ -507,17 +599,15 @@ def _release_batch_run_lock(batch_id: str, now_ts: int | None = None) -> None:
     owner = _batch_run_owner()
     bid = (batch_id or "").strip()
 
-    def _mut(state: dict[str, Any]) -> None:
+    def _mut(state: dict[str, Any]) -> tuple[dict[str, dict[str, Any]], None]:
         batch = state.get(bid)
         if not isinstance(batch, dict):
-            return
+            return {}, None
         if str(batch.get("run_lock_owner") or "") not in ("", owner):
-            return
-        batch["run_lock_owner"] = None
-        batch["run_lock_until_ts"] = now
-        state[bid] = batch
+            return {}, None
+        return {bid: {"run_lock_owner": None, "run_lock_until_ts": now}}, None
 
-    update_json_dict(BATCH_FILE, _mut, root_key="batches")
+    update_json_log(BATCH_FILE, _mut, root_key="batches", compact_bytes=BATCH_LOG_COMPACT_BYTES)
 
 
 def _summarize_batch(batch: dict[str, Any]) -> dict[str, Any]:
@@ -554,7 +644,7 @@ async def tg_use_session(session_name: str) -> dict:
 @mcp.tool()
 async def tg_get_group_info(group: str) -> dict:
     """Get group/channel info to validate the target before action calls."""
-    manager = await ctx.get_manager()
+    manager = ctx.manager or await ctx.get_manager()
     result = await manager.get_group_info(group)
     return result or {"error": "Group not found"}
 
@@ -562,15 +652,14 @@ async def tg_get_group_info(group: str) -> dict:
 @mcp.tool()
 async def tg_resolve_username(username: str) -> dict:
     """Resolve a Telegram @username to user/channel/chat info."""
-    manager = await ctx.get_manager()
-    result = await manager.resolve_username(username)
+    result = await ctx.resolve_username(username)
     return result or {"error": f"Could not resolve username '{username}'"}
 
 
 @mcp.tool()
 async def tg_get_my_dialogs(limit: int = 100, dialog_type: str = "all") -> dict:
     """List dialogs to choose safe action targets."""
-    manager = await ctx.get_manager()
+    manager = ctx.manager or await ctx.get_manager()
     dialogs = await manager.get_my_dialogs(limit=limit, dialog_type=dialog_type)
     return {"count": len(dialogs), "dialogs": dialogs}
 
@@ -613,7 +702,8 @@ async def tg_send_message(
         }
     )
 
-    approval_ok, approval_error, approval_meta = _approval_gate(
+    approval_ok, approval_error, approval_meta = await asyncio.to_thread(
+        _approval_gate,
         action_hash=action_hash,
         dry_run=dry_run,
         approval_code=approval_code,
@@ -635,7 +725,7 @@ async def tg_send_message(
         return result
 
     if not force_resend:
-        duplicate, retry_after_sec = _check_recent_duplicate(action_hash)
+        duplicate, retry_after_sec = await asyncio.to_thread(_check_recent_duplicate, action_hash)
         if duplicate:
             return {
                 "success": False,
@@ -646,10 +736,10 @@ async def tg_send_message(
                 "Set force_resend=true to override.",
             }
 
-    manager = await ctx.get_manager()
+    manager = ctx.manager or await ctx.get_manager()
     sent = await manager.send_message(group, clean_text)
     if sent:
-        _mark_action_executed(action_hash)
+        await asyncio.to_thread(_mark_action_executed, action_hash)
         return {
             "success": True,
             "target": group,
@@ -689,13 +779,15 @@ async def tg_send_file(
     path = (file_path or "").strip()
     if not path:
         return _blocked("file_path is empty")
-    if not os.path.exists(path):
+    # one stat serves the existence/type/size checks and the action hash below
+    try:
+        st = os.stat(path)
+    except OSError:
         return _blocked(f"file_path does not exist: {path}")
-    if not os.path.isfile(path):
+    if not stat.S_ISREG(st.st_mode):
         return _blocked(f"file_path is not a file: {path}")
 
-    file_size_bytes = os.path.getsize(path)
-    file_size_mb = file_size_bytes / (1024 * 1024)
+    file_size_mb = st.st_size / (1024 * 1024)
     if file_size_mb > MAX_FILE_MB:
         return {
             "success": False,
@@ -709,19 +801,19 @@ async def tg_send_file(
             "error": f"caption is too long ({len(clean_caption)} > {MAX_MESSAGE_LEN})",
         }
 
-    stat = os.stat(path)
     action_hash = _hash_payload(
         {
             "action": "send_file",
             "target": _normalize_target(group),
             "file_path": os.path.abspath(path),
-            "file_size": int(stat.st_size),
-            "file_mtime_ns": int(stat.st_mtime_ns),
+            "file_size": int(st.st_size),
+            "file_mtime_ns": int(st.st_mtime_ns),
             "caption": clean_caption,
         }
     )
 
-    approval_ok, approval_error, approval_meta = _approval_gate(
+    approval_ok, approval_error, approval_meta = await asyncio.to_thread(
+        _approval_gate,
         action_hash=action_hash,
         dry_run=dry_run,
         approval_code=approval_code,
@@ -745,7 +837,7 @@ async def tg_send_file(
         return result
 
     if not force_resend:
-        duplicate, retry_after_sec = _check_recent_duplicate(action_hash)
+        duplicate, retry_after_sec = await asyncio.to_thread(_check_recent_duplicate, action_hash)
         if duplicate:
             return {
                 "success": False,
@@ -756,10 +848,10 @@ async def tg_send_file(
                 "Set force_resend=true to override.",
             }
 
-    manager = await ctx.get_manager()
+    manager = ctx.manager or await ctx.get_manager()
     sent = await manager.send_file(group, path, caption=clean_caption)
     if sent:
-        _mark_action_executed(action_hash)
+        await asyncio.to_thread(_mark_action_executed, action_hash)
         return {
             "success": True,
             "target": group,
@@ -805,7 +897,8 @@ async def tg_add_member_to_group(
         }
     )
 
-    approval_ok, approval_error, approval_meta = _approval_gate(
+    approval_ok, approval_error, approval_meta = await asyncio.to_thread(
+        _approval_gate,
         action_hash=action_hash,
         dry_run=dry_run,
         approval_code=approval_code,
@@ -814,7 +907,7 @@ async def tg_add_member_to_group(
         return _blocked(approval_error or "approval gate blocked")
 
     if not dry_run and not force_resend:
-        duplicate, retry_after_sec = _check_recent_duplicate(action_hash)
+        duplicate, retry_after_sec = await asyncio.to_thread(_check_recent_duplicate, action_hash)
         if duplicate:
             return {
                 "success": False,
@@ -825,10 +918,10 @@ async def tg_add_member_to_group(
                 "Set force_resend=true to override.",
             }
 
-    manager = await ctx.get_manager()
+    manager = ctx.manager or await ctx.get_manager()
     result = await manager.add_member_to_group(group, user, dry_run=dry_run)
     if not dry_run and result.get("success"):
-        _mark_action_executed(action_hash)
+        await asyncio.to_thread(_mark_action_executed, action_hash)
     if dry_run and approval_meta:
         result.update(approval_meta)
     result["action_hash"] = action_hash
@@ -864,7 +957,8 @@ async def tg_remove_member_from_group(
         }
     )
 
-    approval_ok, approval_error, approval_meta = _approval_gate(
+    approval_ok, approval_error, approval_meta = await asyncio.to_thread(
+        _approval_gate,
         action_hash=action_hash,
         dry_run=dry_run,
         approval_code=approval_code,
@@ -873,7 +967,7 @@ async def tg_remove_member_from_group(
         return _blocked(approval_error or "approval gate blocked")
 
     if not dry_run and not force_resend:
-        duplicate, retry_after_sec = _check_recent_duplicate(action_hash)
+        duplicate, retry_after_sec = await asyncio.to_thread(_check_recent_duplicate, action_hash)
         if duplicate:
             return {
                 "success": False,
@@ -884,10 +978,10 @@ async def tg_remove_member_from_group(
                 "Set force_resend=true to override.",
             }
 
-    manager = await ctx.get_manager()
+    manager = ctx.manager or await ctx.get_manager()
     result = await manager.remove_member_from_group(group, user, dry_run=dry_run)
     if not dry_run and result.get("success"):
-        _mark_action_executed(action_hash)
+        await asyncio.to_thread(_mark_action_executed, action_hash)
     if dry_run and approval_meta:
         result.update(approval_meta)
     result["action_hash"] = action_hash
@@ -925,7 +1019,8 @@ async def tg_migrate_member(
         }
     )
 
-    approval_ok, approval_error, approval_meta = _approval_gate(
+    approval_ok, approval_error, approval_meta = await asyncio.to_thread(
+        _approval_gate,
         action_hash=action_hash,
         dry_run=dry_run,
         approval_code=approval_code,
@@ -934,7 +1029,7 @@ async def tg_migrate_member(
         return _blocked(approval_error or "approval gate blocked")
 
     if not dry_run and not force_resend:
-        duplicate, retry_after_sec = _check_recent_duplicate(action_hash)
+        duplicate, retry_after_sec = await asyncio.to_thread(_check_recent_duplicate, action_hash)
         if duplicate:
             return {
                 "success": False,
@@ -945,7 +1040,7 @@ async def tg_migrate_member(
                 "Set force_resend=true to override.",
             }
 
-    manager = await ctx.get_manager()
+    manager = ctx.manager or await ctx.get_manager()
     result = await manager.migrate_member(
         group_identifier=group,
         old_user_identifier=old_user,
@@ -953,7 +1048,7 @@ async def tg_migrate_member(
         dry_run=dry_run,
     )
     if not dry_run and result.get("success"):
-        _mark_action_executed(action_hash)
+        await asyncio.to_thread(_mark_action_executed, action_hash)
     if dry_run and approval_meta:
         result.update(approval_meta)
     result["action_hash"] = action_hash
@@ -980,9 +1075,7 @@ async def tg_create_add_member_batch(
         return _blocked("groups list is empty")
 
     batch, blocked_targets = _create_add_member_batch_record(user=user, groups=groups, note=note, ttl_hours=ttl_hours)
-    state = _load_batches_state()
-    state[batch["id"]] = batch
-    _save_batches_state(state)
+    _append_batch_mutation(batch["id"], batch)
 
     summary = _summarize_batch(batch)
     summary["blocked_targets"] = blocked_targets
@@ -1008,7 +1101,7 @@ async def tg_create_add_member_batch_from_report(
         return _blocked(f"report_path is not a file: {path}")
 
     try:
-        report = json.loads(path.read_text(encoding="utf-8"))
+        report = await asyncio.to_thread(_load_report, path)
     except Exception as exc:
         return _blocked(f"failed to parse report: {exc}")
 
@@ -1053,7 +1146,7 @@ async def tg_create_add_member_batch_from_report(
 @mcp.tool()
 async def tg_approve_batch(batch_id: str, confirmation_text: str) -> dict:
     """Approve previously created batch once; after that runs don't need per-action approval."""
-    state, batch = _get_batch(batch_id)
+    _, batch = _get_batch(batch_id)
     if not batch:
         return _blocked(f"batch '{batch_id}' not found")
 
@@ -1065,13 +1158,15 @@ async def tg_approve_batch(batch_id: str, confirmation_text: str) -> dict:
     if not ok:
         return _blocked(err or "confirmation_text validation failed")
 
-    batch["approved"] = True
-    batch["approved_at_ts"] = now
-    batch["approved_until_ts"] = now + BATCH_APPROVAL_LEASE_SEC
+    patch = {
+        "approved": True,
+        "approved_at_ts": now,
+        "approved_until_ts": now + BATCH_APPROVAL_LEASE_SEC,
+    }
     if batch.get("status") == "pending_approval":
-        batch["status"] = "approved"
-    state[batch["id"]] = batch
-    _save_batches_state(state)
+        patch["status"] = "approved"
+    batch.update(patch)
+    _append_batch_mutation(batch["id"], patch)
 
     result = {"success": True, **_summarize_batch(batch)}
     result["approval_lease_sec"] = BATCH_APPROVAL_LEASE_SEC
@@ -1107,64 +1202,68 @@ async def tg_run_add_member_batch(batch_id: str, max_actions: int = 100) -> dict
     if max_actions <= 0:
         return _blocked("max_actions must be > 0")
 
-    state, batch = _get_batch(batch_id)
+    _, batch = _get_batch(batch_id)
     if not batch:
         return _blocked(f"batch '{batch_id}' not found")
 
     now = int(time.time())
-    lock_ok, lock_error = _acquire_batch_run_lock(batch_id, now_ts=now)
+    lock_ok, lock_error = await asyncio.to_thread(_acquire_batch_run_lock, batch_id, now_ts=now)
     if not lock_ok:
         return _blocked(lock_error or "failed to acquire batch run lock", **_summarize_batch(batch))
 
+    # idempotency marks for this run are coalesced into one state write
+    executed_hashes: list[str] = []
+    # every batch write below clears the run lock itself; release separately only if none landed
+    lock_released = False
     try:
-        state, batch = _get_batch(batch_id)
+        _, batch = _get_batch(batch_id)
         if not batch:
             return _blocked(f"batch '{batch_id}' not found")
 
+        unlock = {"run_lock_owner": None, "run_lock_until_ts": now}
+
         if int(batch.get("expires_at_ts", 0)) <= now:
-            batch["status"] = "expired"
-            batch["run_lock_owner"] = None
-            batch["run_lock_until_ts"] = now
-            state[batch["id"]] = batch
-            _save_batches_state(state)
+            patch = {"status": "expired", **unlock}
+            batch.update(patch)
+            _append_batch_mutation(batch["id"], patch)
+            lock_released = True
             return _blocked("batch is expired", **_summarize_batch(batch))
 
         if not bool(batch.get("approved", False)):
-            batch["run_lock_owner"] = None
-            batch["run_lock_until_ts"] = now
-            state[batch["id"]] = batch
-            _save_batches_state(state)
+            batch.update(unlock)
+            _append_batch_mutation(batch["id"], unlock)
+            lock_released = True
             return _blocked("batch is not approved; call tg_approve_batch first", **_summarize_batch(batch))
 
         approved_until_ts = int(batch.get("approved_until_ts") or 0)
         if approved_until_ts <= now:
-            batch["approved"] = False
-            batch["status"] = "pending_approval"
-            batch["run_lock_owner"] = None
-            batch["run_lock_until_ts"] = now
-            state[batch["id"]] = batch
-            _save_batches_state(state)
+            patch = {"approved": False, "status": "pending_approval", **unlock}
+            batch.update(patch)
+            _append_batch_mutation(batch["id"], patch)
+            lock_released = True
             return _blocked("batch approval expired; call tg_approve_batch again", **_summarize_batch(batch))
 
         if batch.get("status") == "completed":
-            batch["run_lock_owner"] = None
-            batch["run_lock_until_ts"] = now
-            state[batch["id"]] = batch
-            _save_batches_state(state)
+            batch.update(unlock)
+            _append_batch_mutation(batch["id"], unlock)
+            lock_released = True
             return {"success": True, "message": "batch already completed", **_summarize_batch(batch)}
 
-        manager = await ctx.get_manager()
+        manager = ctx.manager or await ctx.get_manager()
         processed_now = 0
         stopped_reason = None
+        # Tracked inside the single pass below instead of re-scanning actions afterwards.
+        pending_left = False
 
         batch["status"] = "running"
         batch["last_error"] = None
 
         for action in batch.get("actions", []):
-            if processed_now >= int(max_actions):
-                break
             if action.get("status") != "pending":
                 continue
+            if processed_now >= int(max_actions):
+                pending_left = True
+                break
 
             group = str(action.get("group"))
             allowed, allowed_error = _check_target_allowed(group)
@@ -1184,7 +1283,7 @@ async def tg_run_add_member_batch(batch_id: str, max_actions: int = 100) -> dict
                     action["status"] = "already_member"
                 else:
                     action["status"] = "success"
-                    _mark_action_executed(str(action.get("action_hash", "")))
+                    executed_hashes.append(str(action.get("action_hash", "")))
                 action["last_error"] = None
                 processed_now += 1
                 continue
@@ -1197,6 +1296,7 @@ async def tg_run_add_member_batch(batch_id: str, max_actions: int = 100) -> dict
                 batch["status"] = "paused_quota"
                 batch["last_error"] = err_text
                 stopped_reason = "join_quota_exceeded"
+                pending_left = True
                 break
 
             if "you can't write in this chat" in err_lower:
@@ -1205,7 +1305,6 @@ async def tg_run_add_member_batch(batch_id: str, max_actions: int = 100) -> dict
                 action["status"] = "failed"
             processed_now += 1
 
-        pending_left = any(a.get("status") == "pending" for a in batch.get("actions", []))
         if batch.get("status") == "running":
             batch["status"] = "approved" if pending_left else "completed"
         if batch.get("status") == "completed":
@@ -1214,15 +1313,18 @@ async def tg_run_add_member_batch(batch_id: str, max_actions: int = 100) -> dict
         batch["run_lock_owner"] = None
         batch["run_lock_until_ts"] = now
 
-        state[batch["id"]] = batch
-        _save_batches_state(state)
+        _append_batch_mutation(batch["id"], batch)
+        lock_released = True
 
         summary = _summarize_batch(batch)
         summary["processed_now"] = processed_now
         summary["stopped_reason"] = stopped_reason
         return {"success": True, **summary}
     finally:
-        _release_batch_run_lock(batch_id, now_ts=int(time.time()))
+        if executed_hashes:
+            await asyncio.to_thread(_mark_actions_executed, executed_hashes)
+        if not lock_released:
+            await asyncio.to_thread(_release_batch_run_lock, batch_id, now_ts=int(time.time()))
 
 
 @mcp.tool()
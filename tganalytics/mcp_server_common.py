@@ -2,8 +2,10 @@
 
 from __future__ import annotations
 
-import glob
+import asyncio
 import os
+import time
+from collections import OrderedDict
 from typing import Any
 from pathlib import Path
 
@@ -15,6 +17,15 @@ from tganalytics.domain.groups import GroupManager
 from tganalytics.infra.tele_client import get_client, get_client_for_session
 
 
+RESOLVE_CACHE_TTL_SEC = 600.0
+RESOLVE_CACHE_MAX = 1024
+
+# os.path helpers used by the session tools, bound once at import
+_pjoin = os.path.join
+_pexists = os.path.exists
+_pbasename = os.path.basename
+
+
 def _expected_username() -> str:
     raw = os.environ.get("TG_EXPECTED_USERNAME", "").strip().lstrip("@")
     return raw.lower()
@@ -30,8 +41,8 @@ def _build_session_mismatch_error(expected_username: str, actual_username: str |
     )
 
 
-def _validate_expected_account(me: Any) -> str | None:
-    expected = _expected_username()
+def _validate_expected_account(me: Any, expected: str) -> str | None:
+    """Compare account username with pre-normalized (lowercase, no @) expected value."""
     if not expected:
         return None
 
@@ -51,10 +62,21 @@ class MCPServerContext:
     def __init__(self, sessions_dir: str | None = None, allow_session_switch: bool = True):
         self.sessions_dir = sessions_dir or os.environ.get("TG_SESSIONS_DIR", "data/sessions")
         self.allow_session_switch = allow_session_switch
+        # Normalized once per process; per-connect check is a single string compare.
+        self.expected_username = _expected_username()
 
         self._client = None
         self._manager: GroupManager | None = None
         self._current_session: str | None = None
+        self._me: Any = None
+        # (session name, disconnected client) of the session last switched away from;
+        # switching back reuses the client object but reconnects it through the auth checks
+        self._idle_session: tuple[str, Any] | None = None
+        # ((st_ino, st_mtime_ns) of sessions_dir, sorted names): re-list only when the dir changes
+        self._sessions_cache: tuple[tuple[int, int], list[str]] | None = None
+        # (session, normalized username) -> (monotonic ts, resolved info); bounded LRU
+        self._resolve_cache: OrderedDict[tuple[str | None, str], tuple[float, dict[str, Any]]]
+        self._resolve_cache = OrderedDict()
 
     @property
     def current_session(self) -> str | None:
@@ -64,6 +86,12 @@ class MCPServerContext:
     def client(self) -> Any:
         return self._client
 
+    @property
+    def manager(self) -> GroupManager | None:
+        """Connected manager or None; tools use `ctx.manager or await ctx.get_manager()`
+        so the common connected case skips creating a coroutine."""
+        return self._manager
+
     async def _connect_client(self, client, session_name: str) -> GroupManager:
         await client.connect()
         if not await client.is_user_authorized():
@@ -75,7 +103,7 @@ class MCPServerContext:
             )
 
         me = await client.get_me()
-        mismatch_error = _validate_expected_account(me)
+        mismatch_error = _validate_expected_account(me, self.expected_username)
         if mismatch_error:
             await client.disconnect()
             raise RuntimeError(mismatch_error)
@@ -83,6 +111,8 @@ class MCPServerContext:
         self._client = client
         self._current_session = session_name
         self._manager = GroupManager(client)
+        self._me = me
+        self._resolve_cache.clear()
         return self._manager
 
     async def get_manager(self) -> GroupManager:
@@ -90,7 +120,7 @@ class MCPServerContext:
         if self._manager is None:
             session_path = os.environ.get("TG_SESSION_PATH", "").strip()
             if session_path:
-                session_name = os.path.basename(session_path).replace(".session", "")
+                session_name = _pbasename(session_path).replace(".session", "")
                 client = get_client_for_session(session_path)
             else:
                 session_name = os.environ.get("SESSION_NAME", "default")
@@ -100,12 +130,50 @@ class MCPServerContext:
 
         return self._manager
 
+    async def resolve_username(self, username: str) -> dict[str, Any] | None:
+        """Resolve @username via the manager, caching hits per session for a short TTL."""
+        manager = self.manager or await self.get_manager()
+        key = (self._current_session, username.strip().lstrip("@").casefold())
+        now = time.monotonic()
+        hit = self._resolve_cache.get(key)
+        if hit is not None and now - hit[0] < RESOLVE_CACHE_TTL_SEC:
+            self._resolve_cache.move_to_end(key)
+            return dict(hit[1])
+
+        result = await manager.resolve_username(username)
+        if not result:
+            return result
+        self._resolve_cache[key] = (now, result)
+        self._resolve_cache.move_to_end(key)
+        if len(self._resolve_cache) > RESOLVE_CACHE_MAX:
+            self._resolve_cache.popitem(last=False)
+        return dict(result)
+
+    def _session_names(self) -> list[str]:
+        try:
+            st = os.stat(self.sessions_dir)
+        except OSError:
+            return []
+        key = (st.st_ino, st.st_mtime_ns)
+        if self._sessions_cache is not None and self._sessions_cache[0] == key:
+            return self._sessions_cache[1]
+        try:
+            with os.scandir(self.sessions_dir) as it:
+                # hidden files skipped, as "*.session" glob did
+                names = sorted(
+                    e.name[: -len(".session")]
+                    for e in it
+                    if e.name.endswith(".session") and not e.name.startswith(".") and e.is_file()
+                )
+        except OSError:
+            return []
+        self._sessions_cache = (key, names)
+        return names
+
     async def list_sessions(self) -> dict[str, Any]:
-        sessions = [
-            os.path.basename(path).replace(".session", "")
-            for path in glob.glob(os.path.join(self.sessions_dir, "*.session"))
-        ]
-        return {"sessions": sorted(sessions), "current": self._current_session}
+        # stat/scandir run in a worker thread so a slow sessions dir can't stall other tool calls
+        names = await asyncio.to_thread(self._session_names)
+        return {"sessions": list(names), "current": self._current_session}
 
     async def use_session(self, session_name: str) -> dict[str, Any]:
         if not self.allow_session_switch:
@@ -114,17 +182,33 @@ class MCPServerContext:
                 "Set TG_ALLOW_SESSION_SWITCH=1 to enable tg_use_session."
             }
 
-        path = os.path.join(self.sessions_dir, f"{session_name}.session")
-        if not os.path.exists(path):
+        path = _pjoin(self.sessions_dir, f"{session_name}.session")
+        if not await asyncio.to_thread(_pexists, path):
             return {"error": f"Session '{session_name}' not found"}
 
-        if self._client is not None:
-            await self._client.disconnect()
-
         try:
-            client = get_client_for_session(path)
+            current = self._client if session_name == self._current_session else None
+            prev_session, prev_client = self._current_session, self._client
+            idle = self._idle_session
+            if current is not None:
+                client = current
+            elif idle is not None and idle[0] == session_name:
+                client = idle[1]
+                self._idle_session = None
+            else:
+                client = get_client_for_session(path)
+            # same connect + is_user_authorized + expected-account checks as a fresh session,
+            # also when re-selecting the current one
             await self._connect_client(client, session_name)
-            me = await self._client.get_me()
+            me = self._me
+
+            # one connected account per process: park the previous client disconnected
+            if prev_client is not None and prev_client is not client:
+                try:
+                    await prev_client.disconnect()
+                except Exception:
+                    pass
+                self._idle_session = (prev_session, prev_client)
             return {"switched_to": session_name, "account": me.username or me.first_name}
         except RuntimeError as exc:
             return {"error": str(exc)}
@@ -160,7 +244,7 @@ class MCPServerContext:
                     "username": getattr(me, "username", None),
                     "first_name": getattr(me, "first_name", None),
                 }
-                mismatch_error = _validate_expected_account(me)
+                mismatch_error = _validate_expected_account(me, self.expected_username)
                 if mismatch_error:
                     payload["authorized"] = False
                     payload["error"] = mismatch_error
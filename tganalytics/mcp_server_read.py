@@ -44,7 +44,7 @@ async def tg_use_session(session_name: str) -> dict:
 @mcp.tool()
 async def tg_get_group_info(group: str) -> dict:
     """Get info about a Telegram group/channel (id, title, participants_count, type)."""
-    manager = await ctx.get_manager()
+    manager = ctx.manager or await ctx.get_manager()
     result = await manager.get_group_info(group)
     return result or {"error": "Group not found"}
 
@@ -52,7 +52,7 @@ async def tg_get_group_info(group: str) -> dict:
 @mcp.tool()
 async def tg_get_participants(group: str, limit: int = 100) -> dict:
     """Get participants of a Telegram group (id, username, first_name, is_premium, ...)."""
-    manager = await ctx.get_manager()
+    manager = ctx.manager or await ctx.get_manager()
     participants = await manager.get_participants(group, limit=limit)
     return {"count": len(participants), "participants": participants}
 
@@ -60,7 +60,7 @@ async def tg_get_participants(group: str, limit: int = 100) -> dict:
 @mcp.tool()
 async def tg_search_participants(group: str, query: str, limit: int = 50) -> dict:
     """Search group participants by name or username."""
-    manager = await ctx.get_manager()
+    manager = ctx.manager or await ctx.get_manager()
     participants = await manager.search_participants(group, query, limit=limit)
     return {"count": len(participants), "participants": participants}
 
@@ -68,7 +68,7 @@ async def tg_search_participants(group: str, query: str, limit: int = 50) -> dic
 @mcp.tool()
 async def tg_get_messages(group: str, limit: int = 100, min_id: int = 0) -> dict:
     """Get messages from a Telegram group (id, date, text, from_id, views, ...)."""
-    manager = await ctx.get_manager()
+    manager = ctx.manager or await ctx.get_manager()
     messages = await manager.get_messages(group, limit=limit, min_id=min_id)
     return {"count": len(messages), "messages": messages}
 
@@ -76,7 +76,7 @@ async def tg_get_messages(group: str, limit: int = 100, min_id: int = 0) -> dict
 @mcp.tool()
 async def tg_get_message_count(group: str) -> dict:
     """Get total number of messages in a Telegram group."""
-    manager = await ctx.get_manager()
+    manager = ctx.manager or await ctx.get_manager()
     count = await manager.get_message_count(group)
     if count is not None:
         return {"group": group, "message_count": count}
@@ -86,7 +86,7 @@ async def tg_get_message_count(group: str) -> dict:
 @mcp.tool()
 async def tg_get_group_creation_date(group: str) -> dict:
     """Get approximate creation date of a Telegram group (via first message)."""
-    manager = await ctx.get_manager()
+    manager = ctx.manager or await ctx.get_manager()
     dt = await manager.get_group_creation_date(group)
     if dt is not None:
         return {"group": group, "creation_date": dt.isoformat()}
@@ -96,7 +96,7 @@ async def tg_get_group_creation_date(group: str) -> dict:
 @mcp.tool()
 async def tg_get_my_dialogs(limit: int = 100, dialog_type: str = "all") -> dict:
     """List groups, channels and chats the current account is a member of."""
-    manager = await ctx.get_manager()
+    manager = ctx.manager or await ctx.get_manager()
     dialogs = await manager.get_my_dialogs(limit=limit, dialog_type=dialog_type)
     return {"count": len(dialogs), "dialogs": dialogs}
 
@@ -104,15 +104,15 @@ async def tg_get_my_dialogs(limit: int = 100, dialog_type: str = "all") -> dict:
 @mcp.tool()
 async def tg_resolve_username(username: str) -> dict:
     """Resolve a Telegram @username to user/channel/chat info (id, type, name)."""
-    manager = await ctx.get_manager()
-    result = await manager.resolve_username(username)
+    result = await ctx.resolve_username(username)
     return result or {"error": f"Could not resolve username '{username}'"}
 
 
 @mcp.tool()
 async def tg_get_user_by_id(user_id: int) -> dict:
     """Get user info by numeric Telegram ID."""
-    await ctx.get_manager()
+    if ctx.manager is None:
+        await ctx.get_manager()
     try:
         entity = await safe_call(ctx.client.get_entity, user_id, operation_type="api")
         return {
@@ -131,7 +131,7 @@ async def tg_get_user_by_id(user_id: int) -> dict:
 @mcp.tool()
 async def tg_download_media(group: str, message_id: int, output_dir: str = "data/downloads") -> dict:
     """Download a file/media from a Telegram message to a local directory."""
-    manager = await ctx.get_manager()
+    manager = ctx.manager or await ctx.get_manager()
     path = await manager.download_media(group, message_id, output_dir)
     if path:
         return {"success": True, "path": path}
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from datetime import datetime
 from typing import List, Optional, Dict, Any, Union
@@ -64,6 +65,9 @@ def _is_testing_environment():
         )
     )
 
+# Размер страницы потоковой выгрузки сообщений (один safe_call на страницу)
+_MESSAGES_PAGE_SIZE = 1000
+
 async def _safe_api_call(func, *args, operation_type: str = "api", **kwargs):
     """Helper для условного использования safe_call в зависимости от окружения"""
     if _is_testing_environment():
@@ -75,6 +79,58 @@ async def _safe_api_call(func, *args, operation_type: str = "api", **kwargs):
         logger.debug(f"[PROD] Calling {func.__name__ if hasattr(func, '__name__') else 'function'} via safe_call")
         return await safe_call(func, operation_type=operation_type, *args, **kwargs)
 
+def _message_to_dict(msg) -> Dict[str, Any]:
+    """Сериализует telethon Message в словарь для выгрузки."""
+    # Extract fwd_from info
+    fwd_from = None
+    if msg.fwd_from:
+        fwd = msg.fwd_from
+        fwd_from = {
+            'from_id': None,
+            'from_type': None,
+            'from_name': fwd.from_name,
+            'from_username': None,
+            'from_first_name': None,
+            'from_last_name': None,
+            'date': fwd.date.isoformat() if fwd.date else None,
+            'channel_post': fwd.channel_post,
+        }
+        if fwd.from_id:
+            from telethon.tl.types import PeerUser, PeerChannel, PeerChat
+            if isinstance(fwd.from_id, PeerUser):
+                fwd_from['from_id'] = fwd.from_id.user_id
+                fwd_from['from_type'] = 'user'
+            elif isinstance(fwd.from_id, PeerChannel):
+                fwd_from['from_id'] = fwd.from_id.channel_id
+                fwd_from['from_type'] = 'channel'
+            elif isinstance(fwd.from_id, PeerChat):
+                fwd_from['from_id'] = fwd.from_id.chat_id
+                fwd_from['from_type'] = 'chat'
+        # Resolve name/username from cached entities (no extra API calls)
+        # msg.forward.sender/.chat are populated from the iter_messages response
+        if msg.forward:
+            fwd_entity = msg.forward.sender or msg.forward.chat
+            if fwd_entity:
+                fwd_from['from_username'] = getattr(fwd_entity, 'username', None)
+                fwd_from['from_first_name'] = getattr(fwd_entity, 'first_name', None)
+                fwd_from['from_last_name'] = getattr(fwd_entity, 'last_name', None)
+
+    return {
+        'id': msg.id,
+        'date': msg.date.isoformat() if msg.date else None,
+        'from_id': msg.from_id.user_id if msg.from_id else None,
+        'text': msg.message or '',
+        'fwd_from': fwd_from,
+        'is_reply': msg.reply_to is not None,
+        'reply_to_msg_id': msg.reply_to.reply_to_msg_id if msg.reply_to else None,
+        'views': getattr(msg, 'views', None),
+        'forwards': getattr(msg, 'forwards', None),
+        'is_pinned': getattr(msg, 'is_pinned', False),
+        'has_media': msg.media is not None,
+        'media_type': type(msg.media).__name__ if msg.media else None,
+    }
+
+
 class GroupManager:
     """Менеджер для работы с группами Telegram"""
     
@@ -351,15 +407,15 @@ class GroupManager:
                 logger.warning("Нет участников для экспорта")
                 return False
             
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = ['id', 'username', 'first_name', 'last_name', 'phone', 'is_verified', 'is_premium', 'status']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                
-                writer.writeheader()
-                for participant in participants:
-                    # Очищаем данные для CSV
-                    clean_participant = {k: v for k, v in participant.items() if k in fieldnames}
-                    writer.writerow(clean_participant)
+            fieldnames = ['id', 'username', 'first_name', 'last_name', 'phone', 'is_verified', 'is_premium', 'status']
+            # Большой буфер + writerows: одна пачка записей вместо write на каждую строку
+            with open(filename, 'w', newline='', encoding='utf-8', buffering=1 << 20) as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(fieldnames)
+                # Очищаем данные для CSV: только известные колонки, отсутствующие -> пустая ячейка
+                writer.writerows(
+                    [participant.get(k) for k in fieldnames] for participant in participants
+                )
             
             logger.info(f"Экспортировано {len(participants)} участников в файл {filename}")
             return True
@@ -468,6 +524,43 @@ class GroupManager:
             logger.debug(f"Не удалось получить messages count для {group_identifier}: {e}")
             return None
     
+    async def _resolve_messages_entity(self, group_identifier: Union[str, int]):
+        """Нормализует идентификатор группы и получает entity для чтения сообщений."""
+        if isinstance(group_identifier, int):
+            entity_id = group_identifier
+        elif isinstance(group_identifier, str) and (group_identifier.startswith('-') and group_identifier[1:].isdigit()):
+            entity_id = int(group_identifier)
+        else:
+            if not group_identifier.startswith('@'):
+                entity_id = '@' + group_identifier
+            else:
+                entity_id = group_identifier
+        return await _safe_api_call(self.client.get_entity, entity_id)
+
+    async def _iter_message_dicts(self, entity, limit: Optional[int], min_id: int, max_id: int = 0):
+        count = 0
+        async for msg in self.client.iter_messages(
+            entity,
+            limit=limit,
+            min_id=min_id,
+            max_id=max_id,
+            reverse=False  # От старых к новым
+        ):
+            # Пропускаем служебные сообщения
+            if not msg.message and not msg.media:
+                continue
+
+            yield _message_to_dict(msg)
+            count += 1
+
+            # Smart pause каждые 1000 сообщений
+            if count % 1000 == 0:
+                await smart_pause("participants", count)
+
+            # Проверка лимита
+            if limit and count >= limit:
+                break
+
     async def get_messages(self, group_identifier: Union[str, int], limit: Optional[int] = None, min_id: int = 0) -> List[Dict[str, Any]]:
         """
         Получает сообщения группы с антиспам защитой
@@ -487,97 +580,12 @@ class GroupManager:
             return []
 
         try:
-            # Нормализуем идентификатор группы
-            if isinstance(group_identifier, int):
-                entity_id = group_identifier
-            elif isinstance(group_identifier, str) and (group_identifier.startswith('-') and group_identifier[1:].isdigit()):
-                entity_id = int(group_identifier)
-            else:
-                if not group_identifier.startswith('@'):
-                    entity_id = '@' + group_identifier
-                else:
-                    entity_id = group_identifier
-            
-            # Получаем entity
-            entity = await _safe_api_call(self.client.get_entity, entity_id)
-            
+            entity = await self._resolve_messages_entity(group_identifier)
+
             # Функция для безопасного получения сообщений
             async def fetch_messages_safe():
-                messages = []
-                count = 0
-                
-                async for msg in self.client.iter_messages(
-                    entity,
-                    limit=limit,
-                    min_id=min_id,
-                    reverse=False  # От старых к новым
-                ):
-                    # Пропускаем служебные сообщения
-                    if not msg.message and not msg.media:
-                        continue
-                    
-                    # Extract fwd_from info
-                    fwd_from = None
-                    if msg.fwd_from:
-                        fwd = msg.fwd_from
-                        fwd_from = {
-                            'from_id': None,
-                            'from_type': None,
-                            'from_name': fwd.from_name,
-                            'from_username': None,
-                            'from_first_name': None,
-                            'from_last_name': None,
-                            'date': fwd.date.isoformat() if fwd.date else None,
-                            'channel_post': fwd.channel_post,
-                        }
-                        if fwd.from_id:
-                            from telethon.tl.types import PeerUser, PeerChannel, PeerChat
-                            if isinstance(fwd.from_id, PeerUser):
-                                fwd_from['from_id'] = fwd.from_id.user_id
-                                fwd_from['from_type'] = 'user'
-                            elif isinstance(fwd.from_id, PeerChannel):
-                                fwd_from['from_id'] = fwd.from_id.channel_id
-                                fwd_from['from_type'] = 'channel'
-                            elif isinstance(fwd.from_id, PeerChat):
-                                fwd_from['from_id'] = fwd.from_id.chat_id
-                                fwd_from['from_type'] = 'chat'
-                        # Resolve name/username from cached entities (no extra API calls)
-                        # msg.forward.sender/.chat are populated from the iter_messages response
-                        if msg.forward:
-                            fwd_entity = msg.forward.sender or msg.forward.chat
-                            if fwd_entity:
-                                fwd_from['from_username'] = getattr(fwd_entity, 'username', None)
-                                fwd_from['from_first_name'] = getattr(fwd_entity, 'first_name', None)
-                                fwd_from['from_last_name'] = getattr(fwd_entity, 'last_name', None)
-
-                    message_data = {
-                        'id': msg.id,
-                        'date': msg.date.isoformat() if msg.date else None,
-                        'from_id': msg.from_id.user_id if msg.from_id else None,
-                        'text': msg.message or '',
-                        'fwd_from': fwd_from,
-                        'is_reply': msg.reply_to is not None,
-                        'reply_to_msg_id': msg.reply_to.reply_to_msg_id if msg.reply_to else None,
-                        'views': getattr(msg, 'views', None),
-                        'forwards': getattr(msg, 'forwards', None),
-                        'is_pinned': getattr(msg, 'is_pinned', False),
-                        'has_media': msg.media is not None,
-                        'media_type': type(msg.media).__name__ if msg.media else None,
-                    }
-                    
-                    messages.append(message_data)
-                    count += 1
-                    
-                    # Smart pause каждые 1000 сообщений
-                    if count % 1000 == 0:
-                        await smart_pause("participants", count)
-                    
-                    # Проверка лимита
-                    if limit and count >= limit:
-                        break
-                
-                return messages
-            
+                return [item async for item in self._iter_message_dicts(entity, limit, min_id)]
+
             # Вызываем через safe_call для анти-спам защиты
             messages = await _safe_api_call(fetch_messages_safe)
             
@@ -587,7 +595,114 @@ class GroupManager:
         except Exception as e:
             logger.error(f"Ошибка при получении сообщений группы {group_identifier}: {e}")
             return []
-    
+
+    async def get_messages_parallel(
+        self,
+        group_identifier: Union[str, int],
+        limit: Optional[int] = None,
+        min_id: int = 0,
+        workers: int = 4,
+    ) -> List[Dict[str, Any]]:
+        """
+        Как get_messages, но диапазон ID делится на workers окон, которые
+        выкачиваются параллельно (каждое окно — отдельный safe_call, так что
+        общий темп по-прежнему задает rate limiter).
+
+        С limit нужны только самые новые сообщения — окна не помогают,
+        поэтому собираем iter_messages. Результат: от новых к старым.
+        Вся история держится в памяти. Ошибка любого окна (FLOOD_WAIT сверх
+        порога, сеть) пробрасывается, как в iter_messages, а не превращается
+        в пустой список — иначе выгрузка молча окажется обрезанной.
+        """
+        if limit or workers <= 1:
+            return [item async for item in self.iter_messages(group_identifier, limit=limit, min_id=min_id)]
+
+        is_valid, error_msg = _validate_group_identifier(group_identifier)
+        if not is_valid:
+            logger.error(f"Validation failed: {error_msg}")
+            return []
+
+        entity = await self._resolve_messages_entity(group_identifier)
+        latest = await _safe_api_call(self.client.get_messages, entity, limit=1)
+        latest_id = latest[0].id if latest else 0
+        if latest_id <= min_id:
+            return []
+
+        # Окна [lo, hi] включительно по ID в диапазоне (min_id, latest_id]
+        span = latest_id - min_id
+        step = -(-span // workers)
+        windows = [
+            (lo, min(lo + step - 1, latest_id))
+            for lo in range(min_id + 1, latest_id + 1, step)
+        ]
+
+        async def fetch_window(lo: int, hi: int) -> List[Dict[str, Any]]:
+            return [
+                item async for item in self._iter_message_dicts(entity, None, lo - 1, hi + 1)
+            ]
+
+        chunks = await asyncio.gather(
+            *(_safe_api_call(fetch_window, lo, hi) for lo, hi in windows)
+        )
+        # Окна не пересекаются и каждое уже отсортировано от новых к старым
+        messages = [item for chunk in reversed(chunks) for item in chunk]
+
+        logger.info(
+            f"Получено {len(messages)} сообщений из группы {group_identifier} ({len(windows)} окон)"
+        )
+        return messages
+
+    async def _fetch_message_page(self, entity, limit: int, offset_id: int, min_id: int) -> list:
+        """Одна страница истории (сырые Message) старше offset_id — единица для safe_call."""
+        return [
+            msg
+            async for msg in self.client.iter_messages(
+                entity, limit=limit, offset_id=offset_id, min_id=min_id
+            )
+        ]
+
+    async def iter_messages(self, group_identifier: Union[str, int], limit: Optional[int] = None, min_id: int = 0):
+        """
+        Потоково отдаёт сообщения группы (те же словари, что и get_messages).
+
+        История выкачивается страницами по _MESSAGES_PAGE_SIZE, каждая страница —
+        отдельный safe_call (RPS limiter, circuit breaker, backoff на FLOOD_WAIT),
+        между страницами отдаём накопленное. В памяти не больше одной страницы.
+        В отличие от get_messages, ошибка посреди выгрузки не глотается:
+        вызывающий сам решает, что делать с уже отданной частью (потоковый
+        экспорт пишет во временный файл и удаляет его при ошибке).
+        """
+        is_valid, error_msg = _validate_group_identifier(group_identifier)
+        if not is_valid:
+            logger.error(f"Validation failed: {error_msg}")
+            return
+
+        entity = await self._resolve_messages_entity(group_identifier)
+        offset_id = 0
+        count = 0
+        while True:
+            page = await _safe_api_call(
+                self._fetch_message_page, entity, _MESSAGES_PAGE_SIZE, offset_id, min_id
+            )
+            for msg in page:
+                # Пропускаем служебные сообщения
+                if not msg.message and not msg.media:
+                    continue
+
+                yield _message_to_dict(msg)
+                count += 1
+
+                # Smart pause каждые 1000 сообщений
+                if count % 1000 == 0:
+                    await smart_pause("participants", count)
+
+                if limit and count >= limit:
+                    return
+
+            if len(page) < _MESSAGES_PAGE_SIZE:
+                return
+            offset_id = page[-1].id
+
     async def get_my_dialogs(self, limit: int = 100, dialog_type: str = "all") -> List[Dict[str, Any]]:
         """
         Получает список диалогов (групп/каналов/личных чатов) текущего аккаунта.
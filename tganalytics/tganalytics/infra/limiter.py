@@ -43,6 +43,9 @@ logger = logging.getLogger(__name__)
 
 _COUNTER_KEYS = ("dm_count", "join_count", "group_msg_count", "api_calls", "flood_waits")
 
+# Кэш счётчиков по (inode, mtime, size); 0 — всегда перечитывать (см. _read_counters_file)
+STATE_STAT_CACHE = os.getenv("TG_STATE_STAT_CACHE", "1").strip() != "0"
+
 
 def _today_str() -> str:
     return datetime.now().strftime("%Y-%m-%d")
@@ -186,6 +189,8 @@ class RateLimiter:
         self.circuit_lock_file = self.data_dir / "flood_circuit_state.lock"
 
         self.bucket = TokenBucket(capacity=int(self.rps * 2), refill_rate=self.rps)
+        # (stat key, parsed counters) последнего прочитанного daily_counters.txt
+        self._counters_cache: Optional[tuple[tuple[int, int, int], Dict[str, Any]]] = None
         self.daily_counters = self._load_daily_counters()
 
         logger.info(
@@ -237,9 +242,23 @@ class RateLimiter:
         return normalized
 
     def _read_counters_file(self) -> Dict[str, Any]:
-        if not self.counter_file.exists():
+        try:
+            st = os.stat(self.counter_file)
+        except FileNotFoundError:
+            return self._default_counters()
+        except Exception as exc:
+            logger.warning(f"[SAFE] Failed to read counters: {exc}, using defaults")
             return self._default_counters()
 
+        # Файл заменяется атомарно (os.replace), так что (inode, mtime, size)
+        # меняется при каждой записи; иначе повторно не читаем и не парсим.
+        # Оговорка: на ФС с грубым mtime и переиспользованием inode (ext3, NFS,
+        # некоторые overlay) замена того же размера может выглядеть неизменной;
+        # TG_STATE_STAT_CACHE=0 отключает этот кэш.
+        cache_key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if STATE_STAT_CACHE and self._counters_cache is not None and self._counters_cache[0] == cache_key:
+            return self._normalize_counters(self._counters_cache[1])
+
         parsed: Dict[str, Any] = {}
         try:
             with open(self.counter_file, "r", encoding="utf-8") as f:
@@ -252,6 +271,7 @@ class RateLimiter:
             logger.warning(f"[SAFE] Failed to read counters: {exc}, using defaults")
             return self._default_counters()
 
+        self._counters_cache = (cache_key, parsed)
         return self._normalize_counters(parsed)
 
     def _save_counters_file_atomic(self, counters: Dict[str, Any]) -> None:
@@ -263,6 +283,8 @@ class RateLimiter:
                 for key in _COUNTER_KEYS:
                     f.write(f"{key}={int(counters.get(key, 0))}\n")
             os.replace(tmp_path, self.counter_file)
+            st = os.stat(self.counter_file)
+            self._counters_cache = ((st.st_ino, st.st_mtime_ns, st.st_size), dict(counters))
         finally:
             if os.path.exists(tmp_path):
                 try:
@@ -1,10 +1,15 @@
 import os
 import asyncio
 import atexit
+import importlib
+import inspect
+import pkgutil
 import shlex
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable
 from telethon import TelegramClient
 from telethon.errors import SessionPasswordNeededError, PhoneCodeInvalidError
 from dotenv import load_dotenv
@@ -24,6 +29,12 @@ try:
 except Exception:  # pragma: no cover
     fcntl = None
 
+try:
+    # Optional: in-process Keychain access on macOS (no fork+exec of security(1)).
+    import keyring
+except Exception:  # pragma: no cover
+    keyring = None
+
 # Безопасные пути для хранения данных (настраиваемые)
 # Можно переопределить через SESSION_DIR, по умолчанию в data/sessions
 SESSION_DIR = Path(os.getenv("SESSION_DIR", "data/sessions"))
@@ -97,6 +108,36 @@ AUTH_BOOTSTRAP_ALLOWED_REQUESTS = {
     "AcceptLoginTokenRequest",
 }
 
+
+def _classify_request_name(name: str) -> bool:
+    """Prefix rule: True for write requests, False for read/unknown ones."""
+    if any(name.startswith(prefix) for prefix in READ_REQUEST_PREFIXES):
+        return False
+    return any(name.startswith(prefix) for prefix in WRITE_REQUEST_PREFIXES)
+
+
+def _build_request_write_table() -> dict[type, bool]:
+    """Classify every telethon.tl.functions request class once at import time."""
+    table: dict[type, bool] = {}
+    try:
+        import telethon.tl.functions as functions
+
+        modules = [functions] + [
+            importlib.import_module(info.name)
+            for info in pkgutil.iter_modules(functions.__path__, functions.__name__ + ".")
+        ]
+    except Exception:  # pragma: no cover
+        return table
+    for module in modules:
+        for name, cls in inspect.getmembers(module, inspect.isclass):
+            if name.endswith("Request") and cls.__module__.startswith("telethon.tl.functions"):
+                table[cls] = _classify_request_name(name)
+    return table
+
+
+# type(request) -> is_write; classes outside the table use the prefix rule.
+_REQUEST_WRITE_TABLE = _build_request_write_table()
+
 # Усиление прав доступа для каталога/файлов сессии
 def _harden_session_storage(directory: Path, session_file: Path) -> None:
     try:
@@ -142,6 +183,13 @@ def _read_secret_from_command(env_var: str) -> str:
 def _read_secret_from_keychain(service: str, account: str) -> str:
     if not service or not account:
         return ""
+    if keyring is not None and sys.platform == "darwin":
+        try:
+            value = keyring.get_password(service, account)
+        except Exception:
+            value = None
+        if value:
+            return value.strip()
     try:
         proc = subprocess.run(
             ["security", "find-generic-password", "-s", service, "-a", account, "-w"],
@@ -156,6 +204,28 @@ def _read_secret_from_keychain(service: str, account: str) -> str:
     return (proc.stdout or "").strip()
 
 
+def _fill_missing_secrets(
+    raw_api_id: str,
+    raw_api_hash: str,
+    read_api_id: Callable[[], str],
+    read_api_hash: Callable[[], str],
+) -> tuple[str, str]:
+    """Fill missing secrets; when both are missing, run lookups in parallel.
+
+    Each lookup is a subprocess (fork+exec), so overlapping them halves cold-start latency.
+    """
+    if raw_api_id and raw_api_hash:
+        return raw_api_id, raw_api_hash
+    if raw_api_id:
+        return raw_api_id, read_api_hash()
+    if raw_api_hash:
+        return read_api_id(), raw_api_hash
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        api_id_future = pool.submit(read_api_id)
+        api_hash_future = pool.submit(read_api_hash)
+        return api_id_future.result(), api_hash_future.result()
+
+
 def _load_api_credentials() -> tuple[str, str]:
     provider = os.getenv("TG_SECRET_PROVIDER", "").strip().lower()
     if not provider and os.getenv("TG_USE_KEYCHAIN", "0") == "1":
@@ -170,15 +240,19 @@ def _load_api_credentials() -> tuple[str, str]:
         service = os.getenv("TG_KEYCHAIN_SERVICE", "tg-mcp").strip()
         id_account = os.getenv("TG_KEYCHAIN_ACCOUNT_API_ID", "TG_API_ID").strip()
         hash_account = os.getenv("TG_KEYCHAIN_ACCOUNT_API_HASH", "TG_API_HASH").strip()
-        if not raw_api_id:
-            raw_api_id = _read_secret_from_keychain(service, id_account)
-        if not raw_api_hash:
-            raw_api_hash = _read_secret_from_keychain(service, hash_account)
+        raw_api_id, raw_api_hash = _fill_missing_secrets(
+            raw_api_id,
+            raw_api_hash,
+            lambda: _read_secret_from_keychain(service, id_account),
+            lambda: _read_secret_from_keychain(service, hash_account),
+        )
     elif provider == "command":
-        if not raw_api_id:
-            raw_api_id = _read_secret_from_command("TG_SECRET_CMD_API_ID")
-        if not raw_api_hash:
-            raw_api_hash = _read_secret_from_command("TG_SECRET_CMD_API_HASH")
+        raw_api_id, raw_api_hash = _fill_missing_secrets(
+            raw_api_id,
+            raw_api_hash,
+            lambda: _read_secret_from_command("TG_SECRET_CMD_API_ID"),
+            lambda: _read_secret_from_command("TG_SECRET_CMD_API_HASH"),
+        )
 
     return raw_api_id, raw_api_hash
 
@@ -237,18 +311,15 @@ def _is_telethon_write_request(request: object) -> bool:
         return False
 
     request_cls = request.__class__
-    module = getattr(request_cls, "__module__", "")
-    if "telethon.tl.functions" not in module:
-        return False
-
-    name = getattr(request_cls, "__name__", "")
-    if AUTH_BOOTSTRAP_ENABLED and name in AUTH_BOOTSTRAP_ALLOWED_REQUESTS:
+    is_write = _REQUEST_WRITE_TABLE.get(request_cls)
+    if is_write is None:
+        module = getattr(request_cls, "__module__", "")
+        if "telethon.tl.functions" not in module:
+            return False
+        is_write = _classify_request_name(getattr(request_cls, "__name__", ""))
+    if not is_write:
         return False
-    if any(name.startswith(prefix) for prefix in READ_REQUEST_PREFIXES):
-        return False
-    if any(name.startswith(prefix) for prefix in WRITE_REQUEST_PREFIXES):
-        return True
-    return False
+    return not (AUTH_BOOTSTRAP_ENABLED and request_cls.__name__ in AUTH_BOOTSTRAP_ALLOWED_REQUESTS)
 
 
 def _contains_telethon_write_request(request: object) -> bool: